@@ -0,0 +1,431 @@
+# api.py
+# JSON API for scripts / client.py (same KDC as the web pages, no templates or flash)
+# every POST takes either one object or a JSON list of them. a list gets
+# {"results": [...]} back with a status per item, and the whole batch goes
+# through one IN lookup + one commit instead of a round trip per item
+
+import json
+import random
+import time
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError, DataError, StatementError
+
+from config import (MESSAGE_PAGE_SIZE, MAX_MESSAGE_PAGE_SIZE, MAX_MESSAGE_BATCH_SIZE, MAX_API_BATCH_SIZE,
+                    INBOX_KEEPALIVE, MAX_LONG_POLL_WAIT, MAX_RSA_KEY_BITS, MAX_GROUP_SIZE)
+from models import db, User, Message, GroupSession, SessionMember, GroupMessage
+from keygen import encrypt_many
+from caesar_utils import caesar_encrypt_many
+from cache import user_ids, public_keys, sessions, session_keys
+from provisioning import MAX_NAME_LENGTH, DEFAULT_LABEL, MAX_LABEL_LENGTH, provision_sessions
+from inbox import inbox
+
+api = Blueprint("api", __name__)
+
+# http status for a single (non-batch) request, by item status
+STATUS_CODES = {"created": 201, "exists": 200, "sent": 201,
+                "invalid": 400, "not_found": 404, "conflict": 409}
+
+
+def _items():
+    # (is_batch, list of dicts) from the request body, None if it isn't JSON
+    payload = request.get_json(silent=True)
+    if isinstance(payload, list):
+        return True, payload
+    if isinstance(payload, dict):
+        return False, [payload]
+    return False, None
+
+
+def _respond(batch, results):
+    if batch:
+        return jsonify({"results": results})
+    result = results[0]
+    return jsonify(result), STATUS_CODES.get(result["status"], 200)
+
+
+def _bad_body():
+    return jsonify({"status": "invalid", "error": "expected a JSON object or a list of them"}), 400
+
+
+def _too_many():
+    return jsonify({"status": "invalid", "error": f"at most {MAX_API_BATCH_SIZE} items per batch"}), 413
+
+
+def _as_int(value):
+    # JSON ints only (bools are ints in Python, don't let those through)
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def _name(value):
+    # usernames are strings, anything else counts as missing
+    return value if isinstance(value, str) else None
+
+
+def _label(item):
+    label = item.get("label") or DEFAULT_LABEL
+    return label if isinstance(label, str) and len(label) <= MAX_LABEL_LENGTH else None
+
+
+@api.route("/register", methods=["POST"])
+def register():
+    batch, items = _items()
+    if items is None:
+        return _bad_body()
+    if len(items) > MAX_API_BATCH_SIZE:
+        return _too_many()
+
+    # validate everything first, then one IN query for names that are already taken
+    results, rows = [], {}
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        name = item.get("name")
+        e, n = _as_int(item.get("e")), _as_int(item.get("n"))
+        if not isinstance(name, str) or not name.strip() or len(name.strip()) > MAX_NAME_LENGTH:
+            results.append({"name": name, "status": "invalid", "error": "bad name"})
+        elif e is None or n is None or not 1 < e < n:
+            results.append({"name": name, "status": "invalid", "error": "bad public key"})
+        elif n.bit_length() > MAX_RSA_KEY_BITS:
+            results.append({"name": name, "status": "invalid", "error": f"modulus over {MAX_RSA_KEY_BITS} bits"})
+        elif name.strip() in rows:
+            results.append({"name": name, "status": "invalid", "error": "duplicate name in batch"})
+        else:
+            rows[name.strip()] = {"name": name.strip(), "e": e, "n": n}
+            results.append({"name": name.strip(), "status": "created"})
+
+    taken = user_ids.get_many(list(rows))
+    for result in results:
+        if result["status"] == "created" and result["name"] in taken:
+            result.update(status="conflict", error="user already exists")
+            del rows[result["name"]]
+
+    if rows:
+        try:
+            db.session.execute(insert(User), list(rows.values()))
+            db.session.commit()
+        except IntegrityError:
+            # someone registered one of these in the meantime
+            db.session.rollback()
+            return jsonify({"status": "conflict", "error": "user already exists"}), 409
+        except (DataError, OverflowError, StatementError):
+            # key doesn't fit the column
+            db.session.rollback()
+            return jsonify({"status": "invalid", "error": "public key too large"}), 400
+        public_keys.invalidate(*rows)
+
+    return _respond(batch, results)
+
+
+@api.route("/request-session-key", methods=["POST"])
+def request_session_key():
+    batch, items = _items()
+    if items is None:
+        return _bad_body()
+    if len(items) > MAX_API_BATCH_SIZE:
+        return _too_many()
+
+    requests_ = [(_name(item.get("from")), _name(item.get("to")), _label(item)) if isinstance(item, dict)
+                 else (None, None, None) for item in items]
+    # reuse the session if there already is one (either direction), so asking
+    # twice gives the same key. new ones all go in with one commit
+    try:
+        results = provision_sessions(requests_, encrypt_many)
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"status": "conflict", "error": "session was created concurrently, retry"}), 409
+
+    return _respond(batch, results)
+
+
+@api.route("/send-message", methods=["POST"])
+def send_message():
+    batch, items = _items()
+    if items is None:
+        return _bad_body()
+    if len(items) > MAX_API_BATCH_SIZE:
+        return _too_many()
+
+    items = [(_name(item.get("from")), _name(item.get("to")), _label(item), item.get("message"))
+             if isinstance(item, dict) else (None, None, None, None) for item in items]
+    ids = user_ids.get_many([name for item in items for name in item[:2] if name is not None])
+
+    # the message is already Caesar-encrypted by the client, we only check
+    # there's a session for it and store it
+    known = sessions.get_many([(ids[f], ids[t], label) for f, t, label, _ in items
+                               if label is not None and f in ids and t in ids])
+    results, rows = [], []
+    for from_user, to_user, label, text in items:
+        result = {"from": from_user, "to": to_user, "label": label}
+        results.append(result)
+        if label is None or from_user is None or to_user is None or not isinstance(text, str) or not text:
+            result.update(status="invalid", error="need from, to, message and an optional label")
+        elif ids.get(from_user) is None or ids.get(to_user) is None:
+            result.update(status="not_found", error="one or both users were not found")
+        elif (ids[from_user], ids[to_user], label) not in known:
+            result.update(status="not_found", error="no session between these users, request a session key first")
+        else:
+            result["status"] = "sent"
+            rows.append((result, Message(sender_id=ids[from_user], receiver_id=ids[to_user],
+                                         session_label=label, encrypted_text=text)))
+
+    if rows:
+        db.session.add_all(message for _, message in rows)
+        # flush first so the ids come back with the (batched) INSERT, reading
+        # them after commit would reload every row
+        db.session.flush()
+        for result, message in rows:
+            result["id"] = message.id
+        inbox.notify(db.session, {message.receiver_id for _, message in rows})
+        db.session.commit()
+
+    return _respond(batch, results)
+
+
+@api.route("/send-messages", methods=["POST"])
+def send_messages():
+    # many messages in one session, one INSERT + one commit:
+    #   {"from", "to", "label"?, "messages": [ciphertext, ...]}
+    # or let the server encrypt them (needs the sender's private key, like the web form):
+    #   {"from", "to", "label"?, "d", "p"?, "q"?, "plaintexts": [text, ...]}
+    item = request.get_json(silent=True)
+    if not isinstance(item, dict):
+        return jsonify({"status": "invalid", "error": "expected a JSON object"}), 400
+
+    from_user, to_user, label = _name(item.get("from")), _name(item.get("to")), _label(item)
+    result = {"from": from_user, "to": to_user, "label": label}
+    texts = item.get("plaintexts") if "plaintexts" in item else item.get("messages")
+    if (label is None or from_user is None or to_user is None or not isinstance(texts, list) or not texts or
+            not all(isinstance(text, str) and text for text in texts)):
+        return jsonify(dict(result, status="invalid",
+                            error="need from, to, an optional label and messages or plaintexts "
+                                  "(a non-empty list of non-empty strings)")), 400
+    if len(texts) > MAX_MESSAGE_BATCH_SIZE:
+        return jsonify(dict(result, status="invalid", error=f"at most {MAX_MESSAGE_BATCH_SIZE} messages per batch")), 413
+
+    keys = public_keys.get_many([from_user, to_user])
+    sender, receiver = keys.get(from_user), keys.get(to_user)
+    session = sessions.get(sender and sender.id, receiver and receiver.id, label)
+    if session is None:
+        return jsonify(dict(result, status="not_found", error="no session between these users")), 404
+
+    if "plaintexts" in item:
+        if item.get("d") is None:
+            return jsonify(dict(result, status="invalid", error="plaintexts need the sender's private key d")), 400
+        try:
+            caesar_key = session_keys.decrypt(session, sender, item["d"], item.get("p"), item.get("q"))
+        except (TypeError, ValueError) as e:
+            return jsonify(dict(result, status="invalid", error=f"failed to decrypt session key: {e}")), 400
+        # one translation table for the whole batch
+        texts = caesar_encrypt_many(texts, caesar_key)
+
+    Message.insert_many(sender.id, receiver.id, label, texts)
+    inbox.notify(db.session, [receiver.id])
+    db.session.commit()
+    return jsonify(dict(result, status="sent", count=len(texts))), 201
+
+
+@api.route("/group-sessions", methods=["POST"])
+def create_group_session():
+    # one session for a whole group: {"from": creator, "members": [name, ...], "label"?}
+    # (the creator is always a member). one IN query for every public key, the
+    # Caesar key encrypted for everyone (in the keygen worker processes for big
+    # groups), then the session row, one executemany INSERT for the members and
+    # one commit, no matter how many members there are
+    item = request.get_json(silent=True)
+    if not isinstance(item, dict):
+        return jsonify({"status": "invalid", "error": "expected a JSON object"}), 400
+
+    creator, label, members = _name(item.get("from")), _label(item), item.get("members")
+    result = {"from": creator, "label": label}
+    if creator is None or label is None or not isinstance(members, list) or not all(_name(m) for m in members):
+        return jsonify(dict(result, status="invalid",
+                            error="need from, members (a list of usernames) and an optional label")), 400
+    names = list(dict.fromkeys([creator, *members]))
+    if len(names) < 2:
+        return jsonify(dict(result, status="invalid", error="a group needs at least one other member")), 400
+    if len(names) > MAX_GROUP_SIZE:
+        return jsonify(dict(result, status="invalid", error=f"at most {MAX_GROUP_SIZE} members per group")), 413
+
+    keys = public_keys.get_many(names)
+    missing = [name for name in names if name not in keys]
+    if missing:
+        return jsonify(dict(result, status="not_found", error="some users were not found", missing=missing)), 404
+
+    caesar_key = random.randint(0, 25)
+    encrypted = encrypt_many([caesar_key] * len(names), [(keys[name].e, keys[name].n) for name in names])
+    group = GroupSession(creator_id=keys[creator].id, label=label)
+    db.session.add(group)
+    try:
+        db.session.flush()  # for group.id (reading it after commit would be another SELECT)
+        group_id = group.id
+        SessionMember.insert_many(group_id, {keys[name].id: key for name, key in zip(names, encrypted)})
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify(dict(result, status="conflict", error="you already have a group session with this label")), 409
+
+    # names[0] is the creator, the others fetch theirs with GET /group-sessions
+    return jsonify(dict(result, status="created", id=group_id, members=len(names),
+                        caesar_key_encrypted=encrypted[0])), 201
+
+
+@api.route("/group-sessions")
+def group_sessions():
+    # ?user=bob → every group session bob is in, with bob's copy of the key
+    user_id = user_ids.get(request.args.get("user", ""))
+    if user_id is None:
+        return jsonify({"status": "not_found", "error": "user not found"}), 404
+    rows = db.session.execute(
+        select(GroupSession.id, GroupSession.label, User.name, SessionMember.encrypted_key)
+        .join(SessionMember, SessionMember.session_id == GroupSession.id)
+        .join(User, User.id == GroupSession.creator_id)
+        .where(SessionMember.user_id == user_id)
+        .order_by(GroupSession.id)
+    ).all()
+    return jsonify([{"id": row.id, "label": row.label, "from": row.name, "caesar_key_encrypted": row.encrypted_key}
+                    for row in rows])
+
+
+def _member(group_id, name):
+    # (user id, error response): the user has to be in the group to post or read
+    user_id = user_ids.get(name) if name else None
+    if user_id is None:
+        return None, (jsonify({"status": "not_found", "error": "user not found"}), 404)
+    if db.session.get(SessionMember, (group_id, user_id)) is None:
+        return None, (jsonify({"status": "not_found", "error": "no such group session, or you're not in it"}), 404)
+    return user_id, None
+
+
+@api.route("/group-sessions/<int:group_id>/messages", methods=["POST"])
+def send_group_messages(group_id):
+    # {"from", "messages": [ciphertext, ...]}, already encrypted with the
+    # group's Caesar key (every member decrypts their copy of it from
+    # GET /group-sessions). stored once for the whole group, one INSERT + one commit
+    item = request.get_json(silent=True)
+    if not isinstance(item, dict):
+        return jsonify({"status": "invalid", "error": "expected a JSON object"}), 400
+    texts = item.get("messages")
+    if not isinstance(texts, list) or not texts or not all(isinstance(text, str) and text for text in texts):
+        return jsonify({"status": "invalid",
+                        "error": "need from and messages (a non-empty list of non-empty strings)"}), 400
+    if len(texts) > MAX_MESSAGE_BATCH_SIZE:
+        return jsonify({"status": "invalid", "error": f"at most {MAX_MESSAGE_BATCH_SIZE} messages per batch"}), 413
+
+    sender_id, error = _member(group_id, _name(item.get("from")))
+    if error:
+        return error
+    GroupMessage.insert_many(group_id, sender_id, texts)
+    db.session.commit()
+    return jsonify({"group": group_id, "status": "sent", "count": len(texts)}), 201
+
+
+@api.route("/group-sessions/<int:group_id>/messages")
+def read_group_messages(group_id):
+    # ?user=bob[&after=<id>][&limit=n] → the group's messages after the cursor,
+    # oldest first, same paging (and X-Next-Cursor) as /read-message
+    after = request.args.get("after", 0, type=int)
+    limit = min(max(request.args.get("limit", MESSAGE_PAGE_SIZE, type=int), 1), MAX_MESSAGE_PAGE_SIZE)
+    _, error = _member(group_id, request.args.get("user", ""))
+    if error:
+        return error
+
+    rows = db.session.execute(
+        select(GroupMessage.id, User.name, GroupMessage.encrypted_text)
+        .join(User, User.id == GroupMessage.sender_id)
+        .where(GroupMessage.session_id == group_id, GroupMessage.id > after)
+        .order_by(GroupMessage.id).limit(limit + 1)
+    ).all()
+    response = jsonify([{"id": row.id, "from": row.name, "message": row.encrypted_text} for row in rows[:limit]])
+    if len(rows) > limit:
+        response.headers["X-Next-Cursor"] = str(rows[limit - 1].id)
+    return response
+
+
+def inbox_page(rows, limit):
+    # Message.inbox() rows → (messages, next cursor or None)
+    messages = [{"id": row.id, "from": row.name, "label": row.session_label, "message": row.encrypted_text}
+                for row in rows[:limit]]
+    return messages, (rows[limit - 1].id if len(rows) > limit else None)
+
+
+def _inbox_page(receiver_id, after, limit):
+    # next messages for receiver_id after the cursor (oldest first), narrowed
+    # by ?from= / ?label= if given. an unknown sender gets id 0, which matches nothing
+    sender_id = (user_ids.get(request.args["from"]) or 0) if request.args.get("from") else None
+    rows = db.session.execute(Message.inbox(receiver_id, after, limit, sender_id, request.args.get("label"))).all()
+    return inbox_page(rows, limit)
+
+
+@api.route("/read-message")
+def read_message():
+    # ?user=bob[&from=alice][&label=x][&after=<id>][&limit=n][&wait=<seconds>]
+    # a plain list like client.py expects, oldest first. X-Next-Cursor says
+    # what to pass as after= for the next page (missing on the last one).
+    # with wait= this is a long-poll: if there's nothing new yet the request
+    # blocks until a message arrives (or the time is up) instead of the
+    # client asking again and again
+    name = request.args.get("user", "")
+    after = request.args.get("after", 0, type=int)
+    limit = min(max(request.args.get("limit", MESSAGE_PAGE_SIZE, type=int), 1), MAX_MESSAGE_PAGE_SIZE)
+    wait = min(max(request.args.get("wait", 0, type=int), 0), MAX_LONG_POLL_WAIT)
+
+    receiver_id = user_ids.get(name)
+    if receiver_id is None:
+        return jsonify({"status": "not_found", "error": "user not found"}), 404
+
+    # subscribe before the first query so nothing can slip in between
+    sub = inbox.subscribe(receiver_id) if wait else None
+    try:
+        messages, next_cursor = _inbox_page(receiver_id, after, limit)
+        deadline = time.monotonic() + wait
+        while not messages and sub:
+            # don't sit on a pooled DB connection while we wait
+            db.session.close()
+            if not sub.wait(deadline - time.monotonic()):
+                break
+            messages, next_cursor = _inbox_page(receiver_id, after, limit)
+    finally:
+        if sub:
+            sub.close()
+
+    response = jsonify(messages)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return response
+
+
+@api.route("/inbox")
+def inbox_events():
+    # Server-Sent Events: ?user=bob[&from=alice][&label=x][&after=<id>]
+    # sends everything after the cursor, then holds the connection and pushes
+    # each new message as it's committed (one DB query per notification
+    # instead of one per poll). the event id is the message id, so a
+    # reconnecting EventSource resumes from Last-Event-ID on its own.
+    # each open stream holds a worker thread, run it under a threaded worker
+    receiver_id = user_ids.get(request.args.get("user", ""))
+    if receiver_id is None:
+        return jsonify({"status": "not_found", "error": "user not found"}), 404
+    after = request.headers.get("Last-Event-ID", type=int) or request.args.get("after", 0, type=int)
+
+    sub = inbox.subscribe(receiver_id)
+
+    def events():
+        cursor = after
+        try:
+            while True:
+                messages, next_cursor = _inbox_page(receiver_id, cursor, MAX_MESSAGE_PAGE_SIZE)
+                db.session.close()  # connection goes back to the pool between batches
+                for message in messages:
+                    yield f"id: {message['id']}\nevent: message\ndata: {json.dumps(message)}\n\n"
+                    cursor = message["id"]
+                if next_cursor:
+                    continue
+                if not sub.wait(INBOX_KEEPALIVE):
+                    # keeps proxies from closing the connection, and notices dead clients
+                    yield ": keep-alive\n\n"
+        finally:
+            sub.close()
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
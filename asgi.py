@@ -0,0 +1,179 @@
+# asgi.py
+# ASGI entrypoint: uvicorn asgi:app  (or gunicorn -k uvicorn.workers.UvicornWorker asgi:app)
+# the endpoints that hold a connection open (the /api/inbox SSE stream and
+# /api/read-message?wait= long-polls) run here as coroutines with async DB
+# access, so an idle reader is a parked coroutine instead of a pinned worker.
+# everything else is the normal Flask app from app.py, run in a thread pool
+
+import asyncio
+import json
+import time
+from urllib.parse import parse_qsl
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config import (SQLALCHEMY_DATABASE_URI, ASYNC_DATABASE_URL, ASGI_WSGI_THREADS,
+                    MESSAGE_PAGE_SIZE, MAX_MESSAGE_PAGE_SIZE, INBOX_KEEPALIVE, MAX_LONG_POLL_WAIT, engine_options)
+from app import app as flask_app
+from api import inbox_page
+from cache import user_ids
+from inbox import inbox
+from dbpool import pool_monitor
+from models import Message, User
+
+# same database as the Flask side, through its async driver
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_url(url):
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+")[0]
+    return f"{ASYNC_DRIVERS.get(dialect, scheme)}://{rest}"
+
+
+_url = ASYNC_DATABASE_URL or async_url(SQLALCHEMY_DATABASE_URI)
+engine = create_async_engine(_url, **engine_options(_url))
+pool_monitor.watch("async", engine)
+wsgi = WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)
+
+
+def _int(args, name, default):
+    try:
+        return int(args.get(name, default))
+    except ValueError:
+        return default
+
+
+async def _send_json(send, status, body, headers=()):
+    data = json.dumps(body, sort_keys=True).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(data)).encode()), *headers]})
+    await send({"type": "http.response.body", "body": data})
+
+
+async def _user_id(name):
+    # same username → id cache the Flask side fills, DB only on a miss
+    user_id = user_ids.get_cached(name)
+    if user_id is None and name:
+        async with engine.connect() as conn:
+            user_id = (await conn.execute(select(User.id).where(User.name == name))).scalar()
+        if user_id is not None:
+            user_ids.remember(name, user_id)
+    return user_id
+
+
+async def _inbox_filters(args):
+    # ?from= / ?label= like api.py: an unknown sender gets id 0, which matches nothing
+    sender_id = ((await _user_id(args["from"])) or 0) if args.get("from") else None
+    return sender_id, args.get("label")
+
+
+async def _page(receiver_id, after, limit, sender_id, label):
+    # a pooled connection only for the query itself, not while we wait
+    async with engine.connect() as conn:
+        rows = (await conn.execute(Message.inbox(receiver_id, after, limit, sender_id, label))).all()
+    return inbox_page(rows, limit)
+
+
+async def read_message(args, send):
+    # /api/read-message?wait=: same params and response as the Flask view
+    after = _int(args, "after", 0)
+    limit = min(max(_int(args, "limit", MESSAGE_PAGE_SIZE), 1), MAX_MESSAGE_PAGE_SIZE)
+    wait = min(max(_int(args, "wait", 0), 0), MAX_LONG_POLL_WAIT)
+
+    receiver_id = await _user_id(args.get("user", ""))
+    if receiver_id is None:
+        return await _send_json(send, 404, {"status": "not_found", "error": "user not found"})
+    sender_id, label = await _inbox_filters(args)
+
+    # subscribe before the first query so nothing can slip in between
+    sub = inbox.subscribe_async(receiver_id)
+    try:
+        deadline = time.monotonic() + wait
+        messages, next_cursor = await _page(receiver_id, after, limit, sender_id, label)
+        while not messages and await sub.wait(deadline - time.monotonic()):
+            messages, next_cursor = await _page(receiver_id, after, limit, sender_id, label)
+    finally:
+        sub.close()
+
+    headers = [(b"x-next-cursor", str(next_cursor).encode())] if next_cursor else []
+    await _send_json(send, 200, messages, headers)
+
+
+async def inbox_events(args, headers, receive, send):
+    # /api/inbox: same SSE stream as the Flask view
+    receiver_id = await _user_id(args.get("user", ""))
+    if receiver_id is None:
+        return await _send_json(send, 404, {"status": "not_found", "error": "user not found"})
+    sender_id, label = await _inbox_filters(args)
+    last_event_id = headers.get(b"last-event-id", b"").decode("latin-1")
+    cursor = int(last_event_id) if last_event_id.isdigit() else _int(args, "after", 0)
+
+    sub = inbox.subscribe_async(receiver_id)
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+        sub.wake()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream; charset=utf-8"),
+                                (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]})
+        while not disconnected.is_set():
+            messages, next_cursor = await _page(receiver_id, cursor, MAX_MESSAGE_PAGE_SIZE, sender_id, label)
+            for message in messages:
+                event = f"id: {message['id']}\nevent: message\ndata: {json.dumps(message, sort_keys=True)}\n\n"
+                await send({"type": "http.response.body", "body": event.encode(), "more_body": True})
+                cursor = message["id"]
+            if next_cursor:
+                continue
+            if not await sub.wait(INBOX_KEEPALIVE) and not disconnected.is_set():
+                await send({"type": "http.response.body", "body": b": keep-alive\n\n", "more_body": True})
+    except OSError:
+        pass  # client went away mid-send
+    except PoolTimeoutError:
+        # the stream already started, so no 503. it just ends and the
+        # EventSource reconnects by itself
+        pool_monitor.timed_out("async")
+    finally:
+        watcher.cancel()
+        sub.close()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await engine.dispose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    if scope["type"] == "http" and scope["method"] == "GET":
+        args = dict(parse_qsl(scope["query_string"].decode("latin-1")))
+        try:
+            if scope["path"] == "/api/inbox":
+                return await inbox_events(args, dict(scope["headers"]), receive, send)
+            if scope["path"] == "/api/read-message" and _int(args, "wait", 0) > 0:
+                return await read_message(args, send)
+        except PoolTimeoutError:
+            # same as the Flask side (dbpool.py)
+            pool_monitor.timed_out("async")
+            return await _send_json(send, 503, {"status": "unavailable", "error": "database busy, try again"},
+                                    [(b"retry-after", b"1")])
+
+    await wsgi(scope, receive, send)
@@ -0,0 +1,127 @@
+# benchmarks/bench_asgi_connections.py
+# run from the repo root: python -m benchmarks.bench_asgi_connections [connections ...]
+# how many idle inbox readers each deployment can hold. for each mode it
+# starts a server (procfile's sync `gunicorn app:app`, then `uvicorn asgi:app`),
+# parks N long-polls (/api/read-message?wait=) on one user, then checks
+#   - how long an unrelated request (GET /) takes while they're parked
+#   - how many of the N get the message within 2s once one is sent
+# sync workers serve one request at a time, so everything past the worker
+# count just queues (a probe that hasn't answered after TIMEOUT counts as
+# stuck). every run gets a fresh server so one run's queue can't leak into
+# the next. needs gunicorn + uvicorn installed (requirements.txt).
+# one worker per mode so the in-memory inbox backend sees every message;
+# with postgres (BENCH_DATABASE_URL) raise --workers to match production
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+PORT = 5099
+WAIT = 10  # long-poll timeout the readers ask for
+TIMEOUT = 15  # give up on the probe / the send after this long
+
+
+def server_command(mode, workers):
+    if mode == "sync":
+        return [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{PORT}", "app:app"]
+    return [sys.executable, "-m", "uvicorn", "asgi:app", "--workers", str(workers),
+            "--port", str(PORT), "--log-level", "warning"]
+
+
+def post(path, body):
+    req = urllib.request.Request(f"http://127.0.0.1:{PORT}{path}", data=json.dumps(body).encode(),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=TIMEOUT) as resp:
+        return json.load(resp)
+
+
+async def http_get(path):
+    # bare-bones HTTP/1.0 GET so the client side costs nothing but a socket
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    writer.write(f"GET {path} HTTP/1.0\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return data
+
+
+async def run(connections, user):
+    polls = [asyncio.create_task(http_get(f"/api/read-message?user={user}&wait={WAIT}"))
+             for _ in range(connections)]
+    await asyncio.sleep(1)  # let them all park
+
+    probe_start = time.perf_counter()
+    try:
+        await asyncio.wait_for(http_get("/"), TIMEOUT)
+        probe = time.perf_counter() - probe_start
+    except asyncio.TimeoutError:
+        probe = None
+
+    woken = 0
+    try:
+        await asyncio.to_thread(post, "/api/send-message", {"from": "bench-sender", "to": user, "message": "ping"})
+        done, _ = await asyncio.wait(polls, timeout=2)
+        woken = sum(1 for task in done if not task.exception() and b'"ping"' in task.result())
+    except OSError:
+        pass  # the send itself is stuck in the queue
+
+    for task in polls:
+        task.cancel()
+    await asyncio.gather(*polls, return_exceptions=True)
+    return probe, woken
+
+
+def bench(mode, connections, workers, url):
+    env = dict(os.environ, DATABASE_URL=url, KEYGEN_WORKERS="0", MAX_LONG_POLL_WAIT=str(WAIT))
+    server = subprocess.Popen(server_command(mode, workers), env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{PORT}/", timeout=1)
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        user = f"bench-{mode}-{connections}"
+        post("/api/register", [{"name": name, "e": 3, "n": 3233} for name in (user, "bench-sender")])
+        post("/api/request-session-key", {"from": "bench-sender", "to": user})
+        probe, woken = asyncio.run(run(connections, user))
+        probe = f"{probe * 1000:8.1f} ms" if probe is not None else f"  >{TIMEOUT}s   "
+        print(f"{mode:<6} {connections:>6} parked   GET / took {probe}   {woken:>6}/{connections} woken within 2s")
+    finally:
+        # SIGINT = quick shutdown for both, without waiting out the queued requests
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("counts", nargs="*", type=int, default=[10, 100, 1000])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    args = parser.parse_args()
+
+    url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    subprocess.run([sys.executable, "-c", "from app import app, db\nwith app.app_context(): db.create_all()"],
+                   env=dict(os.environ, DATABASE_URL=url, KEYGEN_WORKERS="0"), check=True)
+
+    print(f"{args.workers} worker(s), readers wait up to {WAIT}s\n")
+    for mode in (["sync", "async"] if args.mode == "both" else [args.mode]):
+        for connections in args.counts:
+            bench(mode, connections, args.workers, url)
+
+
+if __name__ == "__main__":
+    main()
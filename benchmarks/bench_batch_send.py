@@ -0,0 +1,64 @@
+# benchmarks/bench_batch_send.py
+# run from the repo root: python -m benchmarks.bench_batch_send [messages]
+# messages/second through the JSON API: one /api/send-message per message
+# (one INSERT + one commit each) vs /api/send-messages batches (server-side
+# Caesar over the whole batch, one executemany INSERT + one commit).
+# uses a throwaway SQLite file unless BENCH_DATABASE_URL is set, e.g.
+#   BENCH_DATABASE_URL=postgresql://kdc@localhost/kdc_bench python -m benchmarks.bench_batch_send
+
+import os
+import sys
+import tempfile
+import time
+
+BATCH_SIZES = (10, 100, 1000)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("KEYGEN_WORKERS", "0")
+
+    from app import app
+    from models import db
+    from caesar_utils import caesar_encrypt
+    from config import RSA_KEY_BITS
+    from rsa_utils import generate_rsa_keys, rsa_decrypt
+
+    with app.app_context():
+        db.create_all()
+
+    client = app.test_client()
+    run = int(time.time())
+    sender, receiver = f"bench{run}-a", f"bench{run}-b"
+    keys = generate_rsa_keys(RSA_KEY_BITS)
+    client.post("/api/register", json=[{"name": name, "e": keys["e"], "n": keys["n"]} for name in (sender, receiver)])
+    resp = client.post("/api/request-session-key", json={"from": sender, "to": receiver})
+    caesar_key = rsa_decrypt(resp.get_json()["caesar_key_encrypted"][sender], keys, keys["n"])
+
+    texts = [f"message number {i}, the quick brown fox jumps over the lazy dog" for i in range(total)]
+    print(f"{total} messages per run, {url.split(':')[0]}\n")
+
+    start = time.perf_counter()
+    for text in texts:
+        resp = client.post("/api/send-message", json={"from": sender, "to": receiver,
+                                                      "message": caesar_encrypt(text, caesar_key)})
+        assert resp.status_code == 201, resp.get_json()
+    single = time.perf_counter() - start
+    print(f"{'single (client encrypts)':<28} {total / single:>9.0f} msg/s  {single:6.2f} s")
+
+    for size in BATCH_SIZES:
+        start = time.perf_counter()
+        for i in range(0, total, size):
+            resp = client.post("/api/send-messages", json={"from": sender, "to": receiver, "d": keys["d"],
+                                                           "p": keys["p"], "q": keys["q"],
+                                                           "plaintexts": texts[i:i + size]})
+            assert resp.status_code == 201, resp.get_json()
+        elapsed = time.perf_counter() - start
+        print(f"{f'batch of {size} (plaintexts)':<28} {total / elapsed:>9.0f} msg/s  {elapsed:6.2f} s"
+              f"  {single / elapsed:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
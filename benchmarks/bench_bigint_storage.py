@@ -0,0 +1,98 @@
+# benchmarks/bench_bigint_storage.py
+# run from the repo root: python -m benchmarks.bench_bigint_storage [values]
+# what RSA-sized numbers cost in the DB as models.BigInt (big-endian bytes,
+# zero-padded to KEY_BYTES = MAX_RSA_KEY_BITS / 8) vs as decimal text, at
+# 2048 and 4096 bits:
+#   bytes/value   encoded size
+#   bytes/row     table size on disk / rows (SQLite dbstat, postgres relation size)
+#   encode/decode µs per value, Python side only (to_bytes/from_bytes vs str()/int())
+#   read          SELECT of every row, result conversion included
+# uses a throwaway SQLite file unless BENCH_DATABASE_URL is set
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import Column, Integer, MetaData, Table, Text, create_engine, func, insert, select, text
+from sqlalchemy.types import TypeDecorator
+
+from models import BigInt, KEY_BYTES
+
+BITS = (2048, 4096)
+
+
+class DecimalText(TypeDecorator):
+    # the obvious alternative: the number as a decimal string
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else str(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else int(value)
+
+
+def per_value_us(fn, values):
+    start = time.perf_counter()
+    for value in values:
+        fn(value)
+    return (time.perf_counter() - start) / len(values) * 1e6
+
+
+def table_bytes(conn, name):
+    if conn.dialect.name == "postgresql":
+        return conn.execute(text("SELECT pg_total_relation_size(:name)"), {"name": name}).scalar()
+    if conn.dialect.name == "sqlite":
+        return conn.execute(text("SELECT SUM(pgsize) FROM dbstat WHERE name = :name"), {"name": name}).scalar()
+    return None
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bigint.db')}"
+    engine = create_engine(url)
+    print(f"{count} values per run, BigInt width {KEY_BYTES} bytes, {url.split(':')[0]}\n")
+    print(f"{'bits':>5} {'storage':<22} {'bytes/value':>11} {'bytes/row':>10} {'encode µs':>10} "
+          f"{'decode µs':>10} {'read ms':>9}")
+
+    for bits in BITS:
+        values = [random.getrandbits(bits) | (1 << (bits - 1)) for _ in range(count)]
+        # the configured width, plus exactly as wide as these values need
+        variants = [(f"BigInt({width})", BigInt(width)) for width in sorted({KEY_BYTES, bits // 8})
+                    if width >= bits // 8]
+        variants.append(("decimal text", DecimalText()))
+
+        for i, (label, column_type) in enumerate(variants):
+            if isinstance(column_type, BigInt):
+                encode, decode = column_type.encode, column_type.decode
+            else:
+                encode, decode = str, int
+            encoded = [encode(value) for value in values]
+            encode_us = per_value_us(encode, values)
+            decode_us = per_value_us(decode, encoded)
+            assert [decode(data) for data in encoded[:100]] == values[:100]
+
+            table = Table(f"bench_bigint_{bits}_{i}", MetaData(),
+                          Column("id", Integer, primary_key=True), Column("value", column_type, nullable=False))
+            table.drop(engine, checkfirst=True)
+            table.create(engine)
+            with engine.begin() as conn:
+                conn.execute(insert(table), [{"value": value} for value in values])
+            with engine.connect() as conn:
+                size = table_bytes(conn, table.name)
+                start = time.perf_counter()
+                read = conn.execute(select(table.c.value).order_by(table.c.id)).scalars().all()
+                read_ms = (time.perf_counter() - start) * 1000
+                assert read == values and conn.execute(select(func.count()).select_from(table)).scalar() == count
+            table.drop(engine)
+
+            row = f"{size / count:>10.0f}" if size else f"{'?':>10}"
+            print(f"{bits:>5} {label:<22} {len(encoded[0]):>11} {row} {encode_us:>10.2f} "
+                  f"{decode_us:>10.2f} {read_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_bulk_sessions.py
+# run from the repo root: python -m benchmarks.bench_bulk_sessions [pairs ...] [--bits 2048]
+# setting up N sessions one /create-session form post per pair (two lookups,
+# two RSA encryptions and a commit each) vs one /bulk-create-sessions batch
+# (one IN query for the users, one for existing sessions, encrypt_many, one
+# INSERT + commit). "stmts" = SQL statements sent, i.e. DB round trips.
+# every user shares one keypair, RSA costs the same for any key of that size.
+# uses a throwaway SQLite file unless BENCH_DATABASE_URL is set
+
+import argparse
+import itertools
+import os
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pairs", nargs="*", type=int, default=[10, 100, 1000])
+    parser.add_argument("--bits", type=int, default=2048)
+    args = parser.parse_args()
+
+    url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ["KEY_POOL_HIGH_WATERMARK"] = "0"  # no key pool refills competing for the workers
+    os.environ["KEY_POOL_LOW_WATERMARK"] = "0"
+
+    from sqlalchemy import event
+
+    from app import app
+    from cache import public_keys, sessions
+    from models import db
+    from rsa_utils import generate_rsa_keys
+
+    with app.app_context():
+        db.create_all()
+        engine = db.engine
+    statements = [0]
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.__setitem__(0, statements[0] + 1))
+
+    client = app.test_client()
+    keys = generate_rsa_keys(args.bits)
+    run = int(time.time())
+    users = [f"s{run}-{i}" for i in range(int((2 * max(args.pairs)) ** 0.5) + 2)]
+    client.post("/api/register", json=[{"name": name, "e": keys["e"], "n": keys["n"]} for name in users])
+    all_pairs = list(itertools.combinations(users, 2))
+    # big enough for encrypt_many to start the worker processes, so that isn't in the numbers
+    client.post("/bulk-create-sessions", json=[[f, t, "warm-up"] for f, t in all_pairs[:64]])
+
+    print(f"{args.bits}-bit keys, {url.split(':')[0]}\n")
+    print(f"{'pairs':>6} {'per pair':>10} {'stmts':>6} {'bulk':>10} {'stmts':>6} {'speedup':>8}")
+    for count in args.pairs:
+        pairs = all_pairs[:count]
+
+        public_keys.clear()
+        sessions.clear()
+        statements[0] = 0
+        start = time.perf_counter()
+        for from_user, to_user in pairs:
+            client.post("/create-session", data={"from_user": from_user, "to_user": to_user,
+                                                 "session_label": f"one-{count}"})
+        single, single_stmts = time.perf_counter() - start, statements[0]
+
+        public_keys.clear()
+        sessions.clear()
+        statements[0] = 0
+        start = time.perf_counter()
+        resp = client.post("/bulk-create-sessions", json=[{"from": f, "to": t, "label": f"bulk-{count}"}
+                                                          for f, t in pairs])
+        body = resp.get_data(as_text=True)
+        bulk, bulk_stmts = time.perf_counter() - start, statements[0]
+        assert resp.status_code == 200 and body.count(",created,") == count, body[:500]
+
+        print(f"{count:>6} {single * 1000:>7.0f} ms {single_stmts:>6} {bulk * 1000:>7.0f} ms {bulk_stmts:>6} "
+              f"{single / bulk:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
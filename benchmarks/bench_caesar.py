@@ -0,0 +1,69 @@
+# benchmarks/bench_caesar.py
+# run from the repo root: python -m benchmarks.bench_caesar
+
+import random
+import string
+import time
+
+from caesar_utils import caesar_encrypt, caesar_encrypt_many
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+SHIFT = 7
+
+
+# the old per-character version, kept here only as a baseline to compare against
+def legacy_caesar_encrypt(plaintext, shift):
+    result = ""
+    for char in plaintext:
+        if char.isalpha():
+            base = ord('A') if char.isupper() else ord('a')
+            shifted = (ord(char) - base + shift) % 26
+            result += chr(base + shifted)
+        else:
+            result += char
+    return result
+
+
+def make_text(size):
+    alphabet = string.ascii_letters + string.digits + " .,!?\n"
+    return "".join(random.choices(alphabet, k=size))
+
+
+def mb_per_s(func, text, repeat=3):
+    # best of a few runs, so one noisy run doesn't ruin the number
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text, SHIFT)
+        best = min(best, time.perf_counter() - start)
+    return len(text) / best / 1_000_000
+
+
+def main():
+    print(f"{'size':>12} {'legacy MB/s':>14} {'translate MB/s':>16}")
+    for size in SIZES:
+        text = make_text(size)
+        # the legacy loop is painfully slow at 10 MB, skip it there
+        legacy = f"{mb_per_s(legacy_caesar_encrypt, text, repeat=1):14.2f}" if size <= 1_000_000 else f"{'-':>14}"
+        fast = mb_per_s(caesar_encrypt, text)
+        print(f"{size:>12,} {legacy} {fast:16.2f}")
+
+    # batch: lots of small messages, like a long session in read_messages
+    texts = [make_text(200) for _ in range(50_000)]
+    total = sum(len(t) for t in texts)
+
+    start = time.perf_counter()
+    [caesar_encrypt(t, SHIFT) for t in texts]
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    caesar_encrypt_many(texts, SHIFT)
+    batch = time.perf_counter() - start
+
+    print(f"\n{len(texts):,} x 200 B messages:")
+    print(f"  one by one: {total / single / 1_000_000:.2f} MB/s")
+    print(f"  batch:      {total / batch / 1_000_000:.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
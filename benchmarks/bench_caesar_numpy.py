@@ -0,0 +1,58 @@
+# benchmarks/bench_caesar_numpy.py
+# run from the repo root: python -m benchmarks.bench_caesar_numpy
+# compares the translate-table path with the numpy path (needs numpy installed)
+
+import random
+import string
+import sys
+import time
+
+import caesar_utils
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000, 50_000_000]
+SHIFT = 11
+
+
+def make_text(size):
+    alphabet = string.ascii_letters + string.digits + " .,!?\n"
+    return "".join(random.choices(alphabet, k=size))
+
+
+def mb_per_s(func, text, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text, SHIFT)
+        best = min(best, time.perf_counter() - start)
+    return len(text) / best / 1_000_000
+
+
+def translate_path(text, shift):
+    return text.translate(caesar_utils._table_for(text, shift))
+
+
+def main():
+    if caesar_utils._numpy() is None:
+        sys.exit("numpy isn't installed, nothing to compare")
+
+    if caesar_utils.NUMPY_MIN_SIZE is None:
+        print("numpy path is off (set CAESAR_NUMPY_MIN_SIZE to where numpy wins below)\n")
+    else:
+        print(f"auto switch to numpy at {caesar_utils.NUMPY_MIN_SIZE:,} chars\n")
+    print(f"{'size':>12} {'translate str':>14} {'numpy str':>10} {'translate bytes':>16} {'numpy bytes':>12}  (MB/s)")
+    for size in SIZES:
+        text = make_text(size)
+        data = text.encode("ascii")
+
+        # same output either way, otherwise the numbers mean nothing
+        assert translate_path(text, SHIFT) == caesar_utils._numpy_encrypt(text, SHIFT)
+
+        print(f"{size:>12,}"
+              f" {mb_per_s(translate_path, text):14.1f}"
+              f" {mb_per_s(caesar_utils._numpy_encrypt, text):10.1f}"
+              f" {mb_per_s(translate_path, data):16.1f}"
+              f" {mb_per_s(caesar_utils._numpy_encrypt, data):12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/bench_cold_start.py
+# run from the repo root: python -m benchmarks.bench_cold_start [users ...] [--runs 3]
+# how long a fresh worker takes from process start to its first response,
+# with N users in the database. every run is a new interpreter, like a
+# gunicorn worker boot:
+#   import     python start + `import app` (create_app(), no DB access)
+#   GET /      first page (first request also starts the key pool)
+#   first API  first request that touches the DB (opens the first pooled connection)
+#   boot       process start → first API response, wall clock
+# "old" is what importing app.py used to do on top: db.create_all() plus
+# User.query.all() printing every user, which grows with the user count.
+# target: boot under TARGET_BOOT at 1M users, same as with none
+#   python -m benchmarks.bench_cold_start 0 100000 1000000
+# also prints the slowest imports from `python -X importtime -c "import app"`.
+# bytecode has to be cached for realistic numbers, so don't run this with
+# PYTHONDONTWRITEBYTECODE set (the first, untimed run warms __pycache__).
+# uses a throwaway SQLite file per user count unless BENCH_DATABASE_URL is set
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+TARGET_BOOT = 1.0  # seconds, process start → first response, at 1M users
+INSERT_CHUNK = 50_000
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+from app import app
+if {old}:
+    import os
+    from models import db, User
+    with app.app_context(), open(os.devnull, "w") as out:
+        db.create_all()
+        for user in User.query.all():
+            print(user.name, user.e, user.n, file=out)
+booted = time.perf_counter()
+client = app.test_client()
+assert client.get("/").status_code == 200
+home = time.perf_counter()
+assert client.get("/api/read-message", query_string={{"user": "cold-0"}}).status_code in (200, 404)
+api = time.perf_counter()
+print(json.dumps({{"import": booted - start, "home": home - booted, "api": api - home}}))
+"""
+
+
+def populate(url, users):
+    # bulk insert straight through SQLAlchemy core, without the app
+    from sqlalchemy import create_engine, func, insert, select
+    from models import db, User
+
+    engine = create_engine(url)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        have = conn.execute(select(func.count()).select_from(User.__table__)).scalar()
+        for start in range(have, users, INSERT_CHUNK):
+            conn.execute(insert(User.__table__), [
+                {"name": f"cold-{i}", "e": 65537, "n": random.getrandbits(62) | 1}
+                for i in range(start, min(start + INSERT_CHUNK, users))
+            ])
+    engine.dispose()
+
+
+def boot(env, old):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", CHILD.format(old=old)], env=env,
+                         capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["boot"] = time.perf_counter() - start
+    return result
+
+
+def import_profile(env, top):
+    # (cumulative µs, module) for the slowest modules `import app` pulls in,
+    # one level down (what app.py and its first-level imports cost)
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], env=env,
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # nested imports are indented 2 more per level
+        if depth <= 1:
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("users", nargs="*", type=int, default=[0, 100_000])
+    parser.add_argument("--runs", type=int, default=3, help="boots per row, median is shown")
+    parser.add_argument("--top", type=int, default=12, help="how many imports to list")
+    args = parser.parse_args()
+
+    if os.environ.get("PYTHONDONTWRITEBYTECODE"):
+        print("warning: PYTHONDONTWRITEBYTECODE is set, import times include compiling every module\n")
+
+    tmp = tempfile.mkdtemp()
+    print(f"{'users':>10} {'':<5} {'import':>9} {'GET /':>9} {'first API':>10} {'boot':>9}  target")
+    for users in sorted(args.users):
+        url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(tmp, f'cold-{users}.db')}"
+        populate(url, users)
+        env = dict(os.environ, DATABASE_URL=url, KEYGEN_WORKERS="0")
+        boot(env, False)  # warm __pycache__ and the OS file cache
+
+        for old in (False, True):
+            runs = sorted((boot(env, old) for _ in range(args.runs)), key=lambda r: r["boot"])
+            r = runs[len(runs) // 2]
+            verdict = "ok" if r["boot"] < TARGET_BOOT else f"over {TARGET_BOOT:g}s"
+            print(f"{users:>10,} {'old' if old else 'new':<5} {r['import'] * 1000:>6.0f} ms {r['home'] * 1000:>6.1f} ms "
+                  f"{r['api'] * 1000:>7.1f} ms {r['boot'] * 1000:>6.0f} ms  {verdict}")
+
+    print("\nslowest imports (python -X importtime -c 'import app', cumulative):")
+    for cumulative, name in import_profile(env, args.top):
+        print(f"  {cumulative / 1000:>7.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_db_indexes.py
+# run from the repo root: python -m benchmarks.bench_db_indexes [messages]
+# hot read_messages/send_message queries on a big table, without and then with
+# the indexes from models.py (added through migrations.create_missing_indexes).
+# uses a throwaway SQLite file unless BENCH_DATABASE_URL is set
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, distinct, or_, select
+
+from migrations import create_missing_indexes
+from models import db, Message, Session, User
+
+USERS = 1000
+SESSIONS = 20_000
+QUERIES = 50
+
+
+def build(engine, message_count):
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    # start from the old schema: no indexes besides the primary keys
+    for table in (Message.__table__, Session.__table__):
+        for index in table.indexes:
+            index.drop(bind=engine)
+
+    rng = random.Random(42)
+    pairs = set()
+    while len(pairs) < SESSIONS:
+        a, b = rng.sample(range(1, USERS + 1), 2)
+        pairs.add((a, b, f"label{rng.randrange(5)}"))
+    pairs = list(pairs)
+
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": i, "name": f"user{i}", "e": 65537, "n": 1} for i in range(1, USERS + 1)
+        ])
+        conn.execute(Session.__table__.insert(), [
+            {"from_user_id": f, "to_user_id": t, "label": l, "encrypted_for_sender": 1, "encrypted_for_receiver": 1}
+            for f, t, l in pairs
+        ])
+        for start in range(0, message_count, 50_000):
+            rows = []
+            for _ in range(min(50_000, message_count - start)):
+                f, t, l = rng.choice(pairs)
+                rows.append({"sender_id": f, "receiver_id": t, "session_label": l, "encrypted_text": "Khoor Zruog"})
+            conn.execute(Message.__table__.insert(), rows)
+    return pairs
+
+
+def time_queries(engine, pairs):
+    messages, sessions = Message.__table__.c, Session.__table__.c
+    rng = random.Random(7)
+    timings = {"message page": [], "senders for receiver": [], "session lookup": []}
+    with engine.connect() as conn:
+        for _ in range(QUERIES):
+            f, t, l = rng.choice(pairs)
+            queries = {
+                # same shape as web.fetch_message_page
+                "message page": select(messages.id, messages.encrypted_text).where(
+                    messages.receiver_id == t, messages.sender_id == f, messages.session_label == l,
+                    messages.id > 0).order_by(messages.id).limit(51),
+                "senders for receiver": select(distinct(messages.sender_id)).where(messages.receiver_id == t),
+                "session lookup": select(Session.__table__).where(
+                    or_((sessions.from_user_id == f) & (sessions.to_user_id == t),
+                        (sessions.from_user_id == t) & (sessions.to_user_id == f)),
+                    sessions.label == l),
+            }
+            for name, query in queries.items():
+                start = time.perf_counter()
+                conn.execute(query).all()
+                timings[name].append((time.perf_counter() - start) * 1000)
+    return {name: statistics.median(samples) for name, samples in timings.items()}
+
+
+def main():
+    message_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    engine = create_engine(url)
+
+    print(f"building {message_count:,} messages / {SESSIONS:,} sessions on {engine.url.drivername} ...")
+    pairs = build(engine, message_count)
+
+    before = time_queries(engine, pairs)
+    start = time.perf_counter()
+    created = create_missing_indexes(engine)
+    print(f"created {len(created)} indexes in {time.perf_counter() - start:.1f}s\n")
+    after = time_queries(engine, pairs)
+
+    print(f"{'query (median)':>22} {'before ms':>10} {'after ms':>10}")
+    for name in before:
+        print(f"{name:>22} {before[name]:10.2f} {after[name]:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
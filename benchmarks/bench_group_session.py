@@ -0,0 +1,100 @@
+# benchmarks/bench_group_session.py
+# run from the repo root: python -m benchmarks.bench_group_session [members ...] [--bits 2048]
+# creating one group session per size, three ways:
+#   per member   what pairwise create_session does, repeated: look each member
+#                up, encrypt, INSERT (the ORM flushes each row on its own)
+#   endpoint     POST /api/group-sessions: one IN query, encrypt_many, one
+#                executemany INSERT, one commit
+# plus encrypt_many on its own, in this process vs over the keygen worker
+# processes (one per core, so on a single core box the pool can only lose).
+# "stmts" counts SQL statements sent to the DB, i.e. round trips.
+# every user shares one keypair, RSA costs the same for any key of that size.
+# uses a throwaway SQLite file unless BENCH_DATABASE_URL is set
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("members", nargs="*", type=int, default=[10, 100, 500])
+    parser.add_argument("--bits", type=int, default=2048)
+    args = parser.parse_args()
+
+    url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ["PARALLEL_ENCRYPT_MIN"] = "1"  # always the pool when there is one, to see what it costs
+    os.environ["KEY_POOL_HIGH_WATERMARK"] = "0"  # no key pool refills competing for the workers
+    os.environ["KEY_POOL_LOW_WATERMARK"] = "0"
+
+    from sqlalchemy import event
+
+    from app import app
+    from cache import public_keys
+    from keygen import KeygenService
+    from models import db, User, GroupSession, SessionMember
+    from rsa_utils import generate_rsa_keys, rsa_encrypt
+
+    with app.app_context():
+        db.create_all()
+        engine = db.engine
+    statements = [0]
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.__setitem__(0, statements[0] + 1))
+
+    client = app.test_client()
+    keys = generate_rsa_keys(args.bits)
+    run = int(time.time())
+    names = [f"g{run}-{i}" for i in range(max(args.members) + 1)]
+    client.post("/api/register", json=[{"name": name, "e": keys["e"], "n": keys["n"]} for name in names])
+    # start the workers, ours and the app's
+    service = KeygenService()
+    service.encrypt_many([1] * service.max_workers, [(keys["e"], keys["n"])] * service.max_workers)
+    client.post("/api/group-sessions", json={"from": names[0], "members": names[1:2], "label": "warm-up"})
+
+    print(f"{args.bits}-bit keys, {service.max_workers} worker process(es), {url.split(':')[0]}\n")
+    print(f"{'members':>8} {'encrypt here':>13} {'encrypt pool':>13} {'per member':>11} {'stmts':>6} "
+          f"{'endpoint':>9} {'stmts':>6}")
+    for size in args.members:
+        creator, members = names[0], names[1:size + 1]
+        public = [(keys["e"], keys["n"])] * (size + 1)
+
+        start = time.perf_counter()
+        [rsa_encrypt(7, e, n) for e, n in public]
+        local = time.perf_counter() - start
+        start = time.perf_counter()
+        service.encrypt_many([7] * len(public), public)
+        pooled = time.perf_counter() - start
+
+        # the old way, one member at a time
+        with app.app_context():
+            statements[0] = 0
+            start = time.perf_counter()
+            owner = User.query.filter_by(name=creator).first()
+            group = GroupSession(creator_id=owner.id, label=f"naive-{size}")
+            db.session.add(group)
+            db.session.flush()
+            for name in [creator, *members]:
+                user = User.query.filter_by(name=name).first()
+                db.session.add(SessionMember(session_id=group.id, user_id=user.id,
+                                             encrypted_key=rsa_encrypt(random.randint(0, 25), user.e, user.n)))
+                db.session.flush()
+            db.session.commit()
+            naive, naive_stmts = time.perf_counter() - start, statements[0]
+
+        public_keys.clear()  # cold cache, so the key lookup is in the count too
+        statements[0] = 0
+        start = time.perf_counter()
+        resp = client.post("/api/group-sessions", json={"from": creator, "members": members, "label": f"bulk-{size}"})
+        bulk, bulk_stmts = time.perf_counter() - start, statements[0]
+        assert resp.status_code == 201, resp.get_json()
+
+        print(f"{size:>8} {local * 1000:>10.1f} ms {pooled * 1000:>10.1f} ms {naive * 1000:>8.1f} ms {naive_stmts:>6} "
+              f"{bulk * 1000:>6.1f} ms {bulk_stmts:>6}")
+    service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
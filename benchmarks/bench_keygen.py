@@ -0,0 +1,34 @@
+# benchmarks/bench_keygen.py
+# run from the repo root: python -m benchmarks.bench_keygen [runs]
+# keygen latency percentiles per key size (single core)
+
+import statistics
+import sys
+import time
+
+from rsa_utils import generate_rsa_keys
+
+KEY_SIZES = [512, 1024, 2048, 3072]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    print(f"{runs} keys per size\n")
+    print(f"{'bits':>6} {'p50 ms':>10} {'p99 ms':>10} {'mean ms':>10}")
+    for bits in KEY_SIZES:
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            generate_rsa_keys(bits)
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f"{bits:>6} {percentile(samples, 50):10.1f} {percentile(samples, 99):10.1f} {statistics.mean(samples):10.1f}")
+
+
+if __name__ == "__main__":
+    main()
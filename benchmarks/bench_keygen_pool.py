@@ -0,0 +1,36 @@
+# benchmarks/bench_keygen_pool.py
+# run from the repo root: python -m benchmarks.bench_keygen_pool [bits] [keys]
+# keys/second with the process pool at 1..N workers
+
+import os
+import sys
+import time
+
+from keygen import KeygenService
+
+
+def main():
+    bits = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    cores = os.cpu_count() or 1
+
+    workers = sorted({1, 2, 4, 8, 16, 32, cores} & set(range(1, cores + 1)))
+    print(f"{count} x {bits}-bit keys, {cores} cores\n")
+    print(f"{'workers':>8} {'keys/s':>10} {'scaling':>8}")
+
+    baseline = None
+    for n in workers:
+        service = KeygenService(n)
+        service.generate_many(n, bits)  # warm up every worker, so process startup isn't in the numbers
+
+        start = time.perf_counter()
+        keys = service.generate_many(count, bits)
+        rate = len(keys) / (time.perf_counter() - start)
+        service.shutdown()
+
+        baseline = baseline or rate
+        print(f"{n:>8} {rate:10.1f} {rate / baseline:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_modinv.py
+# run from the repo root: python -m benchmarks.bench_modinv [count]
+# checks the new modinv against the old recursive one, then times all three
+
+import random
+import sys
+import time
+
+from rsa_utils import _egcd_modinv, modinv
+
+BITS = 2048
+
+
+# the old recursive version, only kept here for comparison
+def legacy_modinv(e, phi):
+    def egcd(a, b):
+        if a == 0:
+            return (b, 0, 1)
+        gcd, y, x = egcd(b % a, a)
+        return (gcd, x - (b // a) * y, y)
+
+    gcd, x, _ = egcd(e, phi)
+    if gcd != 1:
+        raise Exception("Modular inverse does not exist")
+    return x % phi
+
+
+def inverse_or_none(func, e, phi):
+    try:
+        return func(e, phi)
+    except Exception:
+        return None
+
+
+def timed(func, pairs):
+    start = time.perf_counter()
+    for e, phi in pairs:
+        inverse_or_none(func, e, phi)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    # 2048-bit inputs need ~1200 levels of recursion, more than the default limit
+    sys.setrecursionlimit(10_000)
+
+    rng = random.Random(1234)
+    pairs = []
+    for _ in range(count):
+        phi = rng.getrandbits(BITS) | (1 << (BITS - 1))
+        # mix of random e's (some without an inverse) and the usual 65537
+        e = rng.choice([65537, rng.getrandbits(BITS) % phi or 1])
+        pairs.append((e, phi))
+
+    # property check: all implementations agree, including on "no inverse"
+    for e, phi in pairs:
+        expected = inverse_or_none(legacy_modinv, e, phi)
+        assert inverse_or_none(_egcd_modinv, e, phi) == expected, (e, phi)
+        assert inverse_or_none(modinv, e, phi) == expected, (e, phi)
+        if expected is not None:
+            assert e * expected % phi == 1 % phi
+    print(f"{count} random {BITS}-bit moduli: all implementations agree\n")
+
+    results = [(name, timed(func, pairs)) for name, func in
+               (("recursive (old)", legacy_modinv), ("iterative", _egcd_modinv), ("modinv (pow)", modinv))]
+    legacy = results[0][1]
+    for name, elapsed in results:
+        print(f"{name:>16}: {elapsed / count * 1e6:8.1f} us/call  ({legacy / elapsed:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
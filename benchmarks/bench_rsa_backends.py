@@ -0,0 +1,79 @@
+# benchmarks/bench_rsa_backends.py
+# run from the repo root: python -m benchmarks.bench_rsa_backends [--bits 2048] [--keys 5] [--ops 200]
+# rsa_utils with RSA_BACKEND=python vs RSA_BACKEND=gmpy2: keygen, encrypt
+# (e = 65537), plain decrypt and CRT decrypt. the backend is picked at
+# import, so each one runs in its own process. needs gmpy2 installed for
+# the second row (pip install gmpy2), otherwise it's skipped
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+BACKENDS = ["python", "gmpy2"]
+
+
+def child(bits, keys, ops):
+    from rsa_utils import BACKEND, generate_rsa_keys, rsa_decrypt, rsa_encrypt
+
+    start = time.perf_counter()
+    generated = [generate_rsa_keys(bits) for _ in range(keys)]
+    keygen = (time.perf_counter() - start) / keys
+
+    key = generated[0]
+    n, e = key["n"], key["e"]
+    messages = [random.randrange(n) for _ in range(ops)]
+
+    start = time.perf_counter()
+    ciphers = [rsa_encrypt(m, e, n) for m in messages]
+    encrypt = (time.perf_counter() - start) / ops
+
+    start = time.perf_counter()
+    plain = [rsa_decrypt(c, key["d"], n) for c in ciphers]
+    decrypt = (time.perf_counter() - start) / ops
+
+    start = time.perf_counter()
+    crt = [rsa_decrypt(c, key, n) for c in ciphers]
+    decrypt_crt = (time.perf_counter() - start) / ops
+
+    assert plain == crt == messages
+    print(json.dumps({"backend": BACKEND, "keygen": keygen, "encrypt": encrypt,
+                      "decrypt": decrypt, "decrypt_crt": decrypt_crt}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bits", type=int, default=2048)
+    parser.add_argument("--keys", type=int, default=5, help="keypairs generated per backend")
+    parser.add_argument("--ops", type=int, default=200, help="encryptions / decryptions per backend")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.bits, args.keys, args.ops)
+
+    print(f"{args.bits}-bit keys, {args.keys} keygens and {args.ops} encrypt/decrypts per backend\n")
+    print(f"{'backend':<8} {'keygen ms':>10} {'encrypt µs':>11} {'decrypt ms':>11} {'crt ms':>9}")
+    results = {}
+    for backend in BACKENDS:
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_rsa_backends", "--child", "--bits",
+                              str(args.bits), "--keys", str(args.keys), "--ops", str(args.ops)],
+                             env=dict(os.environ, RSA_BACKEND=backend), capture_output=True, text=True)
+        if out.returncode:
+            print(f"{backend:<8} not available ({out.stderr.strip().splitlines()[-1]})")
+            continue
+        r = results[backend] = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{backend:<8} {r['keygen'] * 1e3:>10.1f} {r['encrypt'] * 1e6:>11.1f} "
+              f"{r['decrypt'] * 1e3:>11.2f} {r['decrypt_crt'] * 1e3:>9.2f}")
+
+    if len(results) == 2:
+        py, gm = results["python"], results["gmpy2"]
+        print(f"{'speedup':<8} {py['keygen'] / gm['keygen']:>9.1f}x {py['encrypt'] / gm['encrypt']:>10.1f}x "
+              f"{py['decrypt'] / gm['decrypt']:>10.1f}x {py['decrypt_crt'] / gm['decrypt_crt']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# benchmarks/bench_rsa_decrypt.py
+# run from the repo root: python -m benchmarks.bench_rsa_decrypt [count]
+# plain pow(c, d, n) vs CRT decryption
+
+import random
+import sys
+import time
+
+from rsa_utils import generate_rsa_keys, rsa_decrypt, rsa_decrypt_crt, rsa_encrypt
+
+KEY_SIZES = [1024, 2048, 3072]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"{'bits':>6} {'plain ms':>10} {'crt ms':>10} {'speedup':>8}")
+    for bits in KEY_SIZES:
+        keys = generate_rsa_keys(bits)
+        n = keys["n"]
+        ciphers = [rsa_encrypt(random.randrange(n), keys["e"], n) for _ in range(count)]
+
+        start = time.perf_counter()
+        plain = [rsa_decrypt(c, keys["d"], n) for c in ciphers]
+        plain_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        crt = [rsa_decrypt_crt(c, keys) for c in ciphers]
+        crt_time = time.perf_counter() - start
+
+        assert plain == crt
+        print(f"{bits:>6} {plain_time / count * 1000:10.2f} {crt_time / count * 1000:10.2f} {plain_time / crt_time:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
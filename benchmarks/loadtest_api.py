@@ -0,0 +1,144 @@
+# benchmarks/loadtest_api.py
+# run from the repo root: python -m benchmarks.loadtest_api [--url http://host:5000] [--users 200] [--threads 8]
+# drives the JSON API (api.py) the way client.py does: register users, ask for
+# session keys, send messages, read inboxes. each phase runs one item per request
+# and then the same work as batches, and prints req/s + latency percentiles.
+# without --url it runs in-process against a throwaway SQLite file (Flask test
+# client, so it measures the app + DB and not the network / WSGI server)
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BATCH_SIZE = 100
+
+
+class HttpClient:
+    # same get/post shape as the Flask test client, over real HTTP
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip("/")
+        self.http = requests.Session()
+
+    def post(self, path, json):
+        resp = self.http.post(self.base_url + path, json=json)
+        return resp.status_code, resp.json()
+
+    def get(self, path, params):
+        resp = self.http.get(self.base_url + path, params=params)
+        return resp.status_code, resp.json()
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def post(self, path, json):
+        resp = self.client.post(path, json=json)
+        return resp.status_code, resp.get_json()
+
+    def get(self, path, params):
+        resp = self.client.get(path, query_string=params)
+        return resp.status_code, resp.get_json()
+
+
+def run_phase(label, make_client, calls, threads):
+    # calls: list of (method, path, payload, items in this request)
+    latencies = []
+
+    def worker(chunk):
+        client = make_client()
+        for method, path, payload, _ in chunk:
+            start = time.perf_counter()
+            status, body = getattr(client, method)(path, payload)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                raise RuntimeError(f"{path} → {status}: {body}")
+
+    chunks = [calls[i::threads] for i in range(threads)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(worker, chunks))
+    elapsed = time.perf_counter() - start
+
+    items = sum(call[3] for call in calls)
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{label:<34} {len(calls):>6} req {len(calls) / elapsed:>9.0f} req/s {items / elapsed:>9.0f} items/s"
+          f"   p50 {p50:6.1f} ms  p99 {p99:6.1f} ms")
+
+
+def batches(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="base URL of a running server (default: in-process test client)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=5, help="messages per user per phase")
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+    else:
+        tmp = tempfile.mkdtemp()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'loadtest.db')}"
+        os.environ.setdefault("KEYGEN_WORKERS", "0")
+        from app import app
+        from models import db
+        with app.app_context():
+            db.create_all()
+        make_client = lambda: InProcessClient(app)
+
+    from config import RSA_KEY_BITS
+    from rsa_utils import generate_rsa_keys
+
+    # one keypair shared by every fake user, keygen isn't what we're measuring here
+    keys = generate_rsa_keys(RSA_KEY_BITS)
+    run = f"{int(time.time())}"
+    half = args.users // 2
+    single = [f"lt{run}-s{i}" for i in range(half)]
+    batched = [f"lt{run}-b{i}" for i in range(args.users - half)]
+
+    def users(names):
+        return [{"name": name, "e": keys["e"], "n": keys["n"]} for name in names]
+
+    def pairs(names):
+        return [{"from": names[i], "to": names[(i + 1) % len(names)]} for i in range(len(names))]
+
+    def messages(names):
+        return [{**pair, "message": f"Khoor #{k}"} for pair in pairs(names) for k in range(args.messages)]
+
+    print(f"{args.users} users, {args.messages} messages each, {args.threads} threads, "
+          f"{'against ' + args.url if args.url else 'in-process'}\n")
+
+    run_phase("register (1 per request)", make_client,
+              [("post", "/api/register", item, 1) for item in users(single)], args.threads)
+    run_phase(f"register (batch of {BATCH_SIZE})", make_client,
+              [("post", "/api/register", chunk, len(chunk)) for chunk in batches(users(batched), BATCH_SIZE)], args.threads)
+
+    run_phase("request-session-key (1 per req)", make_client,
+              [("post", "/api/request-session-key", item, 1) for item in pairs(single)], args.threads)
+    run_phase(f"request-session-key (batch {BATCH_SIZE})", make_client,
+              [("post", "/api/request-session-key", chunk, len(chunk))
+               for chunk in batches(pairs(batched), BATCH_SIZE)], args.threads)
+
+    run_phase("send-message (1 per request)", make_client,
+              [("post", "/api/send-message", item, 1) for item in messages(single)], args.threads)
+    run_phase(f"send-message (batch of {BATCH_SIZE})", make_client,
+              [("post", "/api/send-message", chunk, len(chunk))
+               for chunk in batches(messages(batched), BATCH_SIZE)], args.threads)
+
+    run_phase("read-message", make_client,
+              [("get", "/api/read-message", {"user": name}, 1) for name in single + batched], args.threads)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
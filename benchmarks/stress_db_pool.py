@@ -0,0 +1,105 @@
+# benchmarks/stress_db_pool.py
+# run from the repo root: python -m benchmarks.stress_db_pool [--threads 32] [--seconds 5] [--timeout 0.5]
+# hammers the JSON API from more threads than the pool has connections, once
+# per pool size, and shows where it runs dry: 503s (pool timeouts), p99
+# latency and the most connections ever checked out at once. each size runs
+# in its own process since the pool options are read from the environment
+# at import (DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT, like production).
+# uses a throwaway SQLite file unless BENCH_DATABASE_URL is set
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+POOLS = [(1, 0), (2, 0), (5, 5), (16, 16)]  # (pool_size, max_overflow)
+
+
+def child(threads, seconds):
+    # one run, in this process, with whatever pool the environment asks for
+    from app import app
+    from dbpool import pool_monitor
+    from config import RSA_KEY_BITS
+    from models import db
+    from rsa_utils import generate_rsa_keys
+
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    keys = generate_rsa_keys(RSA_KEY_BITS)
+    names = [f"stress-{os.getpid()}-{i}" for i in range(threads)]
+    client.post("/api/register", json=[{"name": name, "e": keys["e"], "n": keys["n"]} for name in names])
+    client.post("/api/request-session-key", json=[{"from": names[i], "to": names[(i + 1) % threads]}
+                                                  for i in range(threads)])
+
+    statuses, latencies = {}, []
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(i):
+        client = app.test_client()
+        me, partner = names[i], names[(i + 1) % threads]
+        k = 0
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            if k % 2:
+                resp = client.post("/api/send-messages", json={"from": me, "to": partner,
+                                                               "messages": [f"Khoor {k}"] * 20})
+            else:
+                resp = client.get("/api/read-message", query_string={"user": me, "limit": 200})
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+                latencies.append(elapsed)
+            k += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    latencies.sort()
+    print(json.dumps({
+        "statuses": statuses,
+        "rps": len(latencies) / seconds,
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[int(len(latencies) * 0.99)],
+        "pool": pool_monitor.stats()["sync"],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--timeout", type=float, default=0.5, help="DB_POOL_TIMEOUT for every run")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.threads, args.seconds)
+
+    url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress.db')}"
+    print(f"{args.threads} threads for {args.seconds:g}s each, pool timeout {args.timeout:g}s, {url.split(':')[0]}\n")
+    print(f"{'pool+overflow':<14} {'req/s':>8} {'ok':>7} {'503':>6} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'max out':>8} {'timeouts':>9}")
+    for size, overflow in POOLS:
+        env = dict(os.environ, DATABASE_URL=url, KEYGEN_WORKERS="0", DB_POOL_SIZE=str(size),
+                   DB_MAX_OVERFLOW=str(overflow), DB_POOL_TIMEOUT=str(args.timeout))
+        out = subprocess.run([sys.executable, "-m", "benchmarks.stress_db_pool", "--child",
+                              "--threads", str(args.threads), "--seconds", str(args.seconds)],
+                             env=env, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        statuses = result["statuses"]
+        print(f"{f'{size}+{overflow}':<14} {result['rps']:>8.0f} {statuses.get('200', 0) + statuses.get('201', 0):>7} "
+              f"{statuses.get('503', 0):>6} {result['p50'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} "
+              f"{result['pool']['max_checked_out']:>8} {result['pool']['timeouts']:>9}")
+
+
+if __name__ == "__main__":
+    main()
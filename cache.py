@@ -0,0 +1,276 @@
+# cache.py
+# in-process caches in front of the DB
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import g, has_request_context
+from sqlalchemy import tuple_
+
+from config import (PUBLIC_KEY_CACHE_SIZE, PUBLIC_KEY_CACHE_TTL,
+                    SESSION_KEY_CACHE_SIZE, SESSION_KEY_CACHE_TTL)
+from models import db, User, Session
+from rsa_utils import rsa_decrypt, private_key
+
+# keep IN (...) lists under SQLite's bound-parameter limit
+IN_CHUNK_SIZE = 500
+
+_MISSING = object()
+
+# what most routes actually need from a users row
+PublicKey = namedtuple("PublicKey", ["id", "e", "n"])
+
+
+class SessionInfo(namedtuple("SessionInfo", ["id", "from_user_id", "to_user_id", "label",
+                                             "encrypted_for_sender", "encrypted_for_receiver"])):
+    # plain copy of a sessions row, safe to keep around after the DB session closes
+    def key_for(self, user_id):
+        return self.encrypted_for_sender if self.from_user_id == user_id else self.encrypted_for_receiver
+
+
+class TTLCache:
+    # thread-safe LRU with an optional time-to-live per entry + hit/miss counters
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and (entry[0] is None or entry[0] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not _MISSING:
+                del self._entries[key]  # expired
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def pop_matching(self, predicate):
+        # drop every entry whose key matches, returns how many went
+        with self._lock:
+            doomed = [key for key in self._entries if predicate(key)]
+            for key in doomed:
+                del self._entries[key]
+            return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def _request_scope(name):
+    # a dict that lives for the current request only (empty dict outside requests)
+    if not has_request_context():
+        return {}
+    scope = g.setdefault("_kdc_cache", {})
+    return scope.setdefault(name, {})
+
+
+class UserIdResolver:
+    # username → users.id. names never change and users never get deleted,
+    # so a hit stays valid forever (LRU only so memory stays bounded).
+    # misses aren't cached, that name could be registered a second later
+    def __init__(self, maxsize=100_000):
+        self._cache = TTLCache(maxsize)
+
+    def remember(self, name, user_id):
+        self._cache.set(name, user_id)
+
+    def get_many(self, names):
+        # {name: id} for every name that exists, one IN query for the ones we don't know yet
+        found, missing = {}, []
+        for name in dict.fromkeys(names):
+            user_id = self._cache.get(name)
+            if user_id is None:
+                missing.append(name)
+            else:
+                found[name] = user_id
+
+        for i in range(0, len(missing), IN_CHUNK_SIZE):
+            chunk = missing[i:i + IN_CHUNK_SIZE]
+            for name, user_id in db.session.query(User.name, User.id).filter(User.name.in_(chunk)):
+                found[name] = user_id
+                self.remember(name, user_id)
+        return found
+
+    def get(self, name):
+        return self.get_many([name]).get(name)
+
+    def get_cached(self, name):
+        # no DB fallback, for callers that do their own (async) lookup
+        return self._cache.get(name)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class PublicKeyCache:
+    # username → PublicKey(id, e, n). two levels: a per-request dict (so one
+    # request never asks twice) and a process-wide LRU with a TTL. call
+    # invalidate() whenever a user (re)registers
+    def __init__(self, maxsize=10_000, ttl=300):
+        self._cache = TTLCache(maxsize, ttl)
+
+    def get_many(self, names):
+        per_request = _request_scope("public_keys")
+        found, missing = {}, []
+        for name in dict.fromkeys(names):
+            key = per_request.get(name) or self._cache.get(name)
+            if key is None:
+                missing.append(name)
+            else:
+                found[name] = key
+
+        for i in range(0, len(missing), IN_CHUNK_SIZE):
+            chunk = missing[i:i + IN_CHUNK_SIZE]
+            for row in db.session.query(User.name, User.id, User.e, User.n).filter(User.name.in_(chunk)):
+                found[row.name] = PublicKey(row.id, row.e, row.n)
+                self._cache.set(row.name, found[row.name])
+
+        per_request.update(found)
+        return found
+
+    def get(self, name):
+        return self.get_many([name]).get(name)
+
+    def invalidate(self, *names):
+        per_request = _request_scope("public_keys")
+        for name in names:
+            self._cache.pop(name)
+            per_request.pop(name, None)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class SessionCache:
+    # (user, user, label) → SessionInfo, either direction. sessions never change
+    # after they're created, so only "not found" has to go to the DB every time
+    def __init__(self, maxsize=10_000, ttl=300):
+        self._cache = TTLCache(maxsize, ttl)
+
+    def get(self, user_a_id, user_b_id, label):
+        if user_a_id is None or user_b_id is None:
+            return None
+        key = (min(user_a_id, user_b_id), max(user_a_id, user_b_id), label)
+        info = self._cache.get(key)
+        if info is None:
+            row = Session.query.filter(Session.between(user_a_id, user_b_id), Session.label == label).first()
+            if row is None:
+                return None
+            info = SessionInfo(row.id, row.from_user_id, row.to_user_id, row.label,
+                               row.encrypted_for_sender, row.encrypted_for_receiver)
+            self._cache.set(key, info)
+        return info
+
+    def get_many(self, triples):
+        # {(a_id, b_id, label): SessionInfo} for the ones that exist, misses
+        # looked up in both directions with one IN query per chunk
+        found, missing = {}, {}
+        for a_id, b_id, label in dict.fromkeys(triples):
+            key = (min(a_id, b_id), max(a_id, b_id), label)
+            info = self._cache.get(key)
+            if info is None:
+                missing[key] = (a_id, b_id, label)
+            else:
+                found[(a_id, b_id, label)] = info
+
+        keys = list(missing)
+        columns = tuple_(Session.from_user_id, Session.to_user_id, Session.label)
+        for i in range(0, len(keys), IN_CHUNK_SIZE // 2):
+            chunk = keys[i:i + IN_CHUNK_SIZE // 2]
+            wanted = chunk + [(b, a, label) for a, b, label in chunk]
+            for row in Session.query.filter(columns.in_(wanted)):
+                info = SessionInfo(row.id, row.from_user_id, row.to_user_id, row.label,
+                                   row.encrypted_for_sender, row.encrypted_for_receiver)
+                key = (min(row.from_user_id, row.to_user_id), max(row.from_user_id, row.to_user_id), row.label)
+                self._cache.set(key, info)
+                found[missing[key]] = info
+        return found
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class SessionKeyCache:
+    # decrypted Caesar keys, keyed by (user id, session id, fingerprint of the
+    # private key that was submitted). d itself is never stored, only an HMAC
+    # of it under a random per-process secret, so a wrong d just misses.
+    # short TTL + bounded size, and purge_user() for logout
+    def __init__(self, maxsize=10_000, ttl=600):
+        self._cache = TTLCache(maxsize, ttl)
+        self._secret = os.urandom(32)
+
+    def fingerprint(self, d):
+        return hmac.new(self._secret, str(int(d)).encode(), hashlib.sha256).hexdigest()
+
+    def get(self, user_id, session_id, fingerprint):
+        return self._cache.get((user_id, session_id, fingerprint))
+
+    def set(self, user_id, session_id, fingerprint, caesar_key):
+        self._cache.set((user_id, session_id, fingerprint), caesar_key)
+
+    def decrypt(self, session, user, d, p=None, q=None):
+        # Caesar key for user's side of the session, only does the RSA math
+        # when this d hasn't decrypted it recently. the key is built either
+        # way, so a bad p / q is rejected on a hit just like on a miss
+        key = private_key(d, user.n, p, q)
+        fingerprint = self.fingerprint(d)
+        caesar_key = self.get(user.id, session.id, fingerprint)
+        if caesar_key is None:
+            caesar_key = rsa_decrypt(session.key_for(user.id), key, user.n)
+            self.set(user.id, session.id, fingerprint, caesar_key)
+        return caesar_key
+
+    def purge_user(self, user_id):
+        return self._cache.pop_matching(lambda key: key[0] == user_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+# shared instances (one set per worker process), imported by the routes like models.db
+# username → users.id, so routes resolve each name once instead of joining on strings
+user_ids = UserIdResolver()
+# public keys + sessions don't change, so each worker keeps recently used ones around
+public_keys = PublicKeyCache(PUBLIC_KEY_CACHE_SIZE, PUBLIC_KEY_CACHE_TTL)
+sessions = SessionCache(PUBLIC_KEY_CACHE_SIZE, PUBLIC_KEY_CACHE_TTL)
+# decrypted Caesar keys, so the wizard steps don't redo the RSA math every time
+session_keys = SessionKeyCache(SESSION_KEY_CACHE_SIZE, SESSION_KEY_CACHE_TTL)
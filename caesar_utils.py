@@ -1,25 +1,143 @@
 # caesar_utils.py
 
+import os
+import string
+from functools import lru_cache
+
+# only plain ASCII letters get shifted, everything else passes through untouched
+_UPPER = string.ascii_uppercase
+_LOWER = string.ascii_lowercase
+
+# payloads at least this big go through numpy (if it's installed). off unless
+# CAESAR_NUMPY_MIN_SIZE is set: str.translate already does 0.5-1 GB/s, numpy only
+# beat it between ~100 KB and ~1 MB in benchmarks/bench_caesar_numpy.py and
+# lost by 2-3x on bigger payloads (its temporaries fall out of cache), so only
+# turn it on after running that benchmark on the box it'll run on
+NUMPY_MIN_SIZE = int(os.environ["CAESAR_NUMPY_MIN_SIZE"]) if os.environ.get("CAESAR_NUMPY_MIN_SIZE") else None
+
+
+@lru_cache(maxsize=26)
+def _str_table(shift):
+    # translation table for str.translate, one per shift (0-25)
+    upper = _UPPER[shift:] + _UPPER[:shift]
+    lower = _LOWER[shift:] + _LOWER[:shift]
+    return str.maketrans(_UPPER + _LOWER, upper + lower)
+
+
+@lru_cache(maxsize=26)
+def _bytes_table(shift):
+    # same thing but a 256-byte table for bytes.translate
+    upper = _UPPER[shift:] + _UPPER[:shift]
+    lower = _LOWER[shift:] + _LOWER[:shift]
+    return bytes.maketrans((_UPPER + _LOWER).encode(), (upper + lower).encode())
+
+
+def _table_for(text, shift):
+    # normalize shift into 0-25 so the caches never hold more than 26 tables
+    shift %= 26
+    if isinstance(text, (bytes, bytearray)):
+        return _bytes_table(shift)
+    return _str_table(shift)
+
+
+@lru_cache(maxsize=1)
+def _numpy():
+    # numpy is optional, only used for really big payloads (pip install numpy).
+    # imported the first time one shows up, not at startup (it's ~50 ms)
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _use_numpy(text):
+    # numpy only pays off on big buffers, and a str has to be pure ASCII so
+    # one character == one byte (bytes are fine as-is, only A-Z/a-z get touched)
+    if NUMPY_MIN_SIZE is None or len(text) < NUMPY_MIN_SIZE or _numpy() is None:
+        return False
+    return isinstance(text, (bytes, bytearray)) or text.isascii()
+
+
+def _numpy_encrypt(text, shift):
+    np = _numpy()
+    shift %= 26
+    is_str = isinstance(text, str)
+    data = np.frombuffer(text.encode("ascii") if is_str else text, dtype=np.uint8)
+
+    # fold to lowercase (| 0x20) so 'A'-'Z' and 'a'-'z' both land on 0-25,
+    # anything else wraps around to >= 26 (uint8 arithmetic)
+    offset = data | np.uint8(0x20)
+    offset -= np.uint8(97)
+    letter = offset < 26
+    wraps = offset >= 26 - shift
+
+    # add the shift to letters, minus 26 for the ones that run past 'z'
+    delta = letter.view(np.uint8) * np.uint8(shift)
+    delta -= (letter & wraps).view(np.uint8) * np.uint8(26)
+    delta += data
+
+    result = delta.tobytes()
+    if is_str:
+        return result.decode("ascii")
+    # same type back as the translate path gives (bytearray in → bytearray out)
+    return bytearray(result) if isinstance(text, bytearray) else result
+
+
 # function to encrypt a string using Caesar Cipher
 def caesar_encrypt(plaintext, shift):
-    result = ""
-    for char in plaintext:
-        if char.isalpha():
-            # decide if we’re working with uppercase or lowercase
-            base = ord('A') if char.isupper() else ord('a')
-            # shift the letter by 'shift' positions, wrap around with mod 26
-            shifted = (ord(char) - base + shift) % 26
-            result += chr(base + shifted)
-        else:
-            # if it’s not a letter (like punctuation or space), just keep it
-            result += char
-    return result
+    # huge ASCII payloads go through numpy, everything else is one translate call (runs in C)
+    if _use_numpy(plaintext):
+        return _numpy_encrypt(plaintext, shift)
+    return plaintext.translate(_table_for(plaintext, shift))
 
 # decryption is just shifting backwards (negative shift)
 def caesar_decrypt(ciphertext, shift):
     return caesar_encrypt(ciphertext, -shift)
 
 
+# batch versions: look each table up once and reuse it for every message.
+# str and bytes can be mixed, each type gets its own table
+def caesar_encrypt_many(texts, shift):
+    tables = {}
+    result = []
+    for text in texts:
+        if _use_numpy(text):
+            result.append(_numpy_encrypt(text, shift))
+            continue
+        table = tables.get(type(text))
+        if table is None:
+            table = tables[type(text)] = _table_for(text, shift)
+        result.append(text.translate(table))
+    return result
+
+def caesar_decrypt_many(texts, shift):
+    return caesar_encrypt_many(texts, -shift)
+
+
+# streaming versions: handle the text chunk by chunk so memory stays constant.
+# Caesar works letter by letter, so chunk boundaries don't matter at all
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def caesar_iter(chunks, shift):
+    # generator: encrypts each chunk as it comes in (use -shift to decrypt)
+    for chunk in chunks:
+        yield caesar_encrypt(chunk, shift)
+
+def caesar_encrypt_stream(reader, writer, shift, chunk_size=STREAM_CHUNK_SIZE):
+    # reader/writer are any file-like objects (text or binary, just don't mix them)
+    total = 0
+    while True:
+        chunk = reader.read(chunk_size)
+        if not chunk:  # "" or b"" means we hit the end
+            return total
+        writer.write(caesar_encrypt(chunk, shift))
+        total += len(chunk)
+
+def caesar_decrypt_stream(reader, writer, shift, chunk_size=STREAM_CHUNK_SIZE):
+    return caesar_encrypt_stream(reader, writer, -shift, chunk_size)
+
+
 if __name__ == "__main__":
     message = "Hello, World!"  # sample text
     key = 5  # Caesar key
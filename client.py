@@ -1,19 +1,23 @@
+import os
 import requests
+from config import RSA_KEY_BITS
 from rsa_utils import generate_rsa_keys, rsa_decrypt
 from caesar_utils import caesar_encrypt, caesar_decrypt
 
 # Server URL (this is local for now)
-BASE_URL = "http://127.0.0.1:5000"
+BASE_URL = os.environ.get("KDC_URL", "http://127.0.0.1:5000")
+# the JSON endpoints live under /api (the rest of the site is HTML forms)
+API_URL = f"{BASE_URL}/api"
 
 # generate RSA keys for this client (public + private pair)
-keys = generate_rsa_keys()
+keys = generate_rsa_keys(RSA_KEY_BITS)  # up to the server's MAX_RSA_KEY_BITS
 print(f"🔐 Your RSA keys:\nPublic: (e={keys['e']}, n={keys['n']})\nPrivate: d={keys['d']}")
 
 # ask user to register a name (used for sending/receiving)
 name = input("\n📝 Enter your name to register: ").strip()
 
 # register with the server by sending public key
-resp = requests.post(f"{BASE_URL}/register", json={
+resp = requests.post(f"{API_URL}/register", json={
     "name": name,
     "e": keys['e'],
     "n": keys['n']
@@ -29,7 +33,7 @@ else:
 partner = input("💬 Enter the name of the person you want to message: ").strip()
 
 # ask the server (KDC) to send you a session key for Caesar
-resp = requests.post(f"{BASE_URL}/request-session-key", json={
+resp = requests.post(f"{API_URL}/request-session-key", json={
     "from": name,
     "to": partner
 })
@@ -43,7 +47,7 @@ encrypted_key = resp.json()["caesar_key_encrypted"][name]
 print(f"🛡️ Encrypted Caesar key received: {encrypted_key}")
 
 # decrypt the Caesar key using my private RSA key
-caesar_key = rsa_decrypt(encrypted_key, keys['d'], keys['n'])
+caesar_key = rsa_decrypt(encrypted_key, keys, keys['n'])  # keys has p/q, so this uses CRT
 print(f"🔓 Decrypted Caesar key: {caesar_key}")
 
 # get a message from the user and encrypt it with the Caesar key
@@ -52,7 +56,7 @@ encrypted_msg = caesar_encrypt(plaintext, caesar_key)
 print(f"🔐 Encrypted message: {encrypted_msg}")
 
 # send the encrypted message to the server to deliver to partner
-resp = requests.post(f"{BASE_URL}/send-message", json={
+resp = requests.post(f"{API_URL}/send-message", json={
     "from": name,
     "to": partner,
     "message": encrypted_msg
@@ -62,18 +66,36 @@ print(f"📤 Message status: {resp.json()}")
 
 # now check for any new messages for this user
 print("\n📥 Checking for incoming messages...")
-resp = requests.get(f"{BASE_URL}/read-message", params={"user": name})
+resp = requests.get(f"{API_URL}/read-message", params={"user": name})
 messages = resp.json()
 
+def show(msg):
+    # decrypt one message and print it
+    sender = msg['from']
+    ciphertext = msg['message']
+    decrypted = caesar_decrypt(ciphertext, caesar_key)
+    print(f"From {sender}:")
+    print(f"🔒 {ciphertext}")
+    print(f"🔓 {decrypted}\n")
+
 # if there are messages, decrypt and show them
 if isinstance(messages, list) and messages:
     print(f"\n🧾 You have {len(messages)} message(s):")
     for msg in messages:
-        sender = msg['from']
-        ciphertext = msg['message']
-        decrypted = caesar_decrypt(ciphertext, caesar_key)
-        print(f"From {sender}:")
-        print(f"🔒 {ciphertext}")
-        print(f"🔓 {decrypted}\n")
+        show(msg)
 else:
     print("📭 No new messages.")
+
+# then keep listening. wait= makes the server hold the request until
+# something new arrives, so this loop isn't hitting the DB every second
+print("📡 Waiting for new messages (Ctrl+C to quit)...")
+last_id = messages[-1]['id'] if isinstance(messages, list) and messages else 0
+try:
+    while True:
+        resp = requests.get(f"{API_URL}/read-message", params={"user": name, "after": last_id, "wait": 30},
+                            timeout=40)
+        for msg in resp.json():
+            show(msg)
+            last_id = msg['id']
+except KeyboardInterrupt:
+    print("👋 Bye!")
@@ -6,3 +6,91 @@ import os
 SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+# connection pool, per worker process. every worker has its own pool, so the DB
+# sees up to workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections, keep that
+# under postgres' max_connections. a sync gunicorn worker only ever uses one
+# connection at a time, threaded / ASGI workers up to one per thread
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+# seconds a request waits for a free connection before it gets a 503
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+# reconnect connections older than this (seconds, -1 = never), below most
+# proxies' / load balancers' idle timeouts
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+# check each connection with a cheap ping on checkout, so a DB restart costs
+# one reconnect instead of one failed request per pooled connection
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1').lower() not in ('0', 'false', 'no')
+
+
+def engine_options(url):
+    # engine kwargs for url (sync or async). in-memory SQLite has no real pool to size
+    if not url or url.split('://', 1)[-1] in ('', '/:memory:'):
+        return {}
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+
+
+# RSA modulus size for new users
+RSA_KEY_BITS = int(os.environ.get('RSA_KEY_BITS', 2048))
+# biggest modulus the DB takes. users.n and the encrypted session keys are
+# stored zero-padded to this many bits (models.BigInt), so it's also their
+# size on disk: 2048 here halves them if nobody needs 4096-bit keys
+MAX_RSA_KEY_BITS = int(os.environ.get('MAX_RSA_KEY_BITS', 4096))
+
+# pre-generated keypair pool for /register: the background thread refills
+# up to the high watermark whenever it drops below the low one
+KEY_POOL_LOW_WATERMARK = int(os.environ.get('KEY_POOL_LOW_WATERMARK', 2))
+KEY_POOL_HIGH_WATERMARK = int(os.environ.get('KEY_POOL_HIGH_WATERMARK', 10))
+
+# web worker processes (gunicorn reads the same variable, unset = 1 like gunicorn)
+WEB_CONCURRENCY = max(int(os.environ.get('WEB_CONCURRENCY', 1)), 1)
+# worker processes for key generation, per web worker (0 = generate inside the
+# web worker instead). every web worker starts its own pool, so the box runs
+# WEB_CONCURRENCY * KEYGEN_WORKERS of them, all CPU bound. the default splits
+# the cores between the web workers instead of giving each one all of them
+KEYGEN_WORKERS = int(os.environ.get('KEYGEN_WORKERS', max((os.cpu_count() or 1) // WEB_CONCURRENCY, 1)))
+# encrypting one key for at least this many members (group sessions) goes
+# to those same worker processes, smaller batches aren't worth shipping over
+PARALLEL_ENCRYPT_MIN = int(os.environ.get('PARALLEL_ENCRYPT_MIN', 64))
+
+# most members a group session can have
+MAX_GROUP_SIZE = int(os.environ.get('MAX_GROUP_SIZE', 1000))
+# most names one /bulk-register upload can hold. every keypair is generated
+# inside the request (~0.5 s each per keygen worker at 2048 bits), so this
+# keeps it well under gunicorn's 30 s timeout even on one core. bigger lists
+# go through the CLI: flask --app app provision-users names.csv
+MAX_REGISTER_BATCH_SIZE = int(os.environ.get('MAX_REGISTER_BATCH_SIZE', 25))
+
+# process-wide cache of users' public keys (e, n), per gunicorn worker
+PUBLIC_KEY_CACHE_SIZE = int(os.environ.get('PUBLIC_KEY_CACHE_SIZE', 10000))
+PUBLIC_KEY_CACHE_TTL = int(os.environ.get('PUBLIC_KEY_CACHE_TTL', 300))  # seconds
+
+# decrypted session (Caesar) keys, keyed by a hash of the submitted private key
+SESSION_KEY_CACHE_SIZE = int(os.environ.get('SESSION_KEY_CACHE_SIZE', 10000))
+SESSION_KEY_CACHE_TTL = int(os.environ.get('SESSION_KEY_CACHE_TTL', 600))  # seconds
+
+# messages per page in read_messages (clients can ask for up to the max)
+MESSAGE_PAGE_SIZE = int(os.environ.get('MESSAGE_PAGE_SIZE', 50))
+MAX_MESSAGE_PAGE_SIZE = int(os.environ.get('MAX_MESSAGE_PAGE_SIZE', 500))
+# most messages one batch send (/api/send-messages) can carry
+MAX_MESSAGE_BATCH_SIZE = int(os.environ.get('MAX_MESSAGE_BATCH_SIZE', 10000))
+# most items in one JSON list sent to the other /api endpoints (and in one
+# /bulk-create-sessions upload)
+MAX_API_BATCH_SIZE = int(os.environ.get('MAX_API_BATCH_SIZE', 5000))
+# how inbox readers get woken up: "memory" (this process only), "postgres"
+# (LISTEN/NOTIFY, reaches every worker) or "auto" (postgres if that's the DB)
+INBOX_BACKEND = os.environ.get('INBOX_BACKEND', 'auto')
+# seconds between SSE keep-alive comments, and the longest a long-poll may wait
+INBOX_KEEPALIVE = int(os.environ.get('INBOX_KEEPALIVE', 15))
+MAX_LONG_POLL_WAIT = int(os.environ.get('MAX_LONG_POLL_WAIT', 30))
+# asgi.py: async driver URL (default: DATABASE_URL with asyncpg / aiosqlite
+# swapped in) and threads for the Flask routes it passes through
+ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 10))
+# rows per DB round trip when streaming a whole conversation (read_messages stream=1)
+MESSAGE_STREAM_BATCH_SIZE = int(os.environ.get('MESSAGE_STREAM_BATCH_SIZE', 500))
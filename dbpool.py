@@ -0,0 +1,77 @@
+# dbpool.py
+# connection pool numbers for /metrics: what's checked out right now, the
+# most that ever was, and how often a request gave up waiting for one.
+# a pool that keeps hitting max_checked_out == size + overflow (or has any
+# timeouts) is too small for the worker's threads
+
+import threading
+
+from flask import jsonify, request
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+
+class PoolMonitor:
+    def __init__(self):
+        self._engines = {}  # label -> (engine, counters)
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        with app.app_context():
+            self.watch("sync", db.engine)
+        app.register_error_handler(PoolTimeoutError, self._pool_timeout)
+
+    def watch(self, label, engine):
+        # engine can be an async engine too (asgi.py), its pool lives on sync_engine
+        engine = getattr(engine, "sync_engine", engine)
+        counters = {"connects": 0, "checkouts": 0, "invalidated": 0, "max_checked_out": 0, "timeouts": 0}
+        self._engines[label] = (engine, counters)
+
+        def on_connect(dbapi_connection, connection_record):
+            with self._lock:
+                counters["connects"] += 1
+
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            checked_out = getattr(engine.pool, "checkedout", lambda: 0)()
+            with self._lock:
+                counters["checkouts"] += 1
+                counters["max_checked_out"] = max(counters["max_checked_out"], checked_out)
+
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                counters["invalidated"] += 1
+
+        event.listen(engine, "connect", on_connect)
+        event.listen(engine, "checkout", on_checkout)
+        event.listen(engine, "invalidate", on_invalidate)
+
+    def timed_out(self, label):
+        with self._lock:
+            self._engines[label][1]["timeouts"] += 1
+
+    def stats(self):
+        out = {}
+        for label, (engine, counters) in self._engines.items():
+            pool = engine.pool
+            stats = {"class": type(pool).__name__}
+            # not every pool class (SingletonThreadPool, StaticPool, ...) has all of these
+            for name in ("size", "checkedout", "checkedin", "overflow"):
+                if hasattr(pool, name):
+                    stats[name] = getattr(pool, name)()
+            if hasattr(pool, "_max_overflow"):
+                stats["max_overflow"] = pool._max_overflow
+            with self._lock:
+                stats.update(counters)
+            out[label] = stats
+        return out
+
+    def _pool_timeout(self, error):
+        # every connection busy for longer than DB_POOL_TIMEOUT: tell the
+        # client to come back instead of a 500
+        self.timed_out("sync")
+        if request.path.startswith("/api/"):
+            return jsonify({"status": "unavailable", "error": "database busy, try again"}), 503, {"Retry-After": "1"}
+        return "⚠️ Database busy, try again in a moment.", 503, {"Retry-After": "1"}
+
+
+pool_monitor = PoolMonitor()
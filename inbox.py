@@ -0,0 +1,229 @@
+# inbox.py
+# "user X has new messages" notifications, so inbox readers (SSE / long-poll
+# in api.py) can block until something arrives instead of polling the DB.
+# routes call inbox.notify(receiver_ids) before they commit new messages; the
+# notification only goes out if that commit actually happens
+
+import asyncio
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import event, text
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "kdc_inbox"
+
+
+class Subscription:
+    # one waiting reader. notifications only say "look again", so several
+    # of them before the reader wakes up collapse into one
+    def __init__(self, broker, receiver_id):
+        self.broker = broker
+        self.receiver_id = receiver_id
+        self._event = threading.Event()
+
+    def wake(self):
+        self._event.set()
+
+    def wait(self, timeout=None):
+        # True if something arrived (since the last wait), False on timeout
+        fired = self._event.wait(timeout)
+        self._event.clear()
+        return fired
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class AsyncSubscription(Subscription):
+    # same thing for a coroutine (asgi.py). publish() runs on whatever thread
+    # committed the message (a flask thread, the LISTEN thread), so the
+    # wake-up hops over to the event loop
+    def __init__(self, broker, receiver_id):
+        super().__init__(broker, receiver_id)
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def wake(self):
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            pass  # loop already closed, nobody is waiting anymore
+
+    async def wait(self, timeout=None):
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            fired = True
+        except asyncio.TimeoutError:
+            fired = False
+        self._event.clear()
+        return fired
+
+
+class MemoryBroker:
+    # fan-out inside this process only: fine for SQLite, tests and a single
+    # worker, other gunicorn workers won't hear about each other's messages
+    name = "memory"
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)  # receiver_id -> {Subscription}
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, receiver_id, subscription_class=Subscription):
+        sub = subscription_class(self, receiver_id)
+        with self._lock:
+            self._subscribers[receiver_id].add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.receiver_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.receiver_id]
+
+    def publish(self, receiver_ids):
+        # wake everyone waiting on these receivers (None = everyone)
+        with self._lock:
+            if receiver_ids is None:
+                subs = [sub for group in self._subscribers.values() for sub in group]
+            else:
+                subs = [sub for rid in receiver_ids for sub in self._subscribers.get(rid, ())]
+            self.published += 1
+        for sub in subs:
+            sub.wake()
+
+    def before_commit(self, session, receiver_ids):
+        pass
+
+    def after_commit(self, receiver_ids):
+        self.publish(receiver_ids)
+
+    def stats(self):
+        with self._lock:
+            return {"backend": self.name, "receivers": len(self._subscribers),
+                    "subscribers": sum(len(group) for group in self._subscribers.values()),
+                    "published": self.published}
+
+
+class PostgresBroker(MemoryBroker):
+    # NOTIFY goes out inside the transaction that inserted the messages (so
+    # postgres only delivers it if that commits), and one LISTEN connection
+    # per process turns them back into local publish() calls. that way every
+    # worker hears about every message, whichever worker stored it
+    name = "postgres"
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def subscribe(self, receiver_id, subscription_class=Subscription):
+        self._start()
+        return super().subscribe(receiver_id, subscription_class)
+
+    def before_commit(self, session, receiver_ids):
+        # one NOTIFY per receiver, all in one round trip
+        session.execute(text("SELECT pg_notify(:channel, rid::text) FROM unnest(CAST(:ids AS integer[])) AS rid"),
+                        {"channel": CHANNEL, "ids": sorted(receiver_ids)})
+
+    def after_commit(self, receiver_ids):
+        pass  # comes back through LISTEN, same as for the other workers
+
+    def _start(self):
+        # listener thread only starts once someone actually waits (not in CLI commands)
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen_loop, name="inbox-listener", daemon=True)
+                self._thread.start()
+
+    def _listen_loop(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("inbox listener lost its connection, reconnecting")
+                time.sleep(1)
+            # anything could have arrived while we weren't listening
+            self.publish(None)
+
+    def _listen(self):
+        conn = self.engine.raw_connection()
+        try:
+            dbapi_conn = conn.driver_connection
+            dbapi_conn.autocommit = True
+            with dbapi_conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            while True:
+                if select.select([dbapi_conn], [], [], 30) == ([], [], []):
+                    continue
+                dbapi_conn.poll()
+                receiver_ids = set()
+                while dbapi_conn.notifies:
+                    receiver_ids.add(int(dbapi_conn.notifies.pop(0).payload))
+                if receiver_ids:
+                    self.publish(receiver_ids)
+        finally:
+            conn.invalidate()  # don't hand a LISTENing connection back to the pool
+
+
+class Inbox:
+    # picks a broker per app (INBOX_BACKEND: auto / memory / postgres) and
+    # hooks the SQLAlchemy session so notify() follows the transaction
+    def __init__(self):
+        self.broker = None
+        self._hooked = False
+
+    def init_app(self, app, db):
+        backend = app.config.get("INBOX_BACKEND", "auto")
+        with app.app_context():
+            engine = db.engine
+        if backend == "postgres" or (backend == "auto" and engine.dialect.name == "postgresql"):
+            self.broker = PostgresBroker(engine)
+        else:
+            self.broker = MemoryBroker()
+
+        if self._hooked:
+            return
+        self._hooked = True
+        event.listen(db.session, "before_commit", self._before_commit)
+        event.listen(db.session, "after_commit", self._after_commit)
+        event.listen(db.session, "after_soft_rollback", self._after_rollback)
+
+    def notify(self, session, receiver_ids):
+        # call before session.commit() for every receiver that got new messages
+        session.info.setdefault("inbox_pending", set()).update(receiver_ids)
+
+    def subscribe(self, receiver_id):
+        return self.broker.subscribe(receiver_id)
+
+    def subscribe_async(self, receiver_id):
+        # call from inside the event loop
+        return self.broker.subscribe(receiver_id, AsyncSubscription)
+
+    def stats(self):
+        return self.broker.stats() if self.broker else {}
+
+    def _before_commit(self, session):
+        pending = session.info.get("inbox_pending")
+        if pending:
+            self.broker.before_commit(session, pending)
+
+    def _after_commit(self, session):
+        pending = session.info.pop("inbox_pending", None)
+        if pending:
+            self.broker.after_commit(pending)
+
+    def _after_rollback(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop("inbox_pending", None)
+
+
+inbox = Inbox()
@@ -0,0 +1,224 @@
+# keygen.py
+# keeps RSA keypairs ready ahead of time so /register doesn't sit there
+# searching for primes while the user waits
+
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from config import (RSA_KEY_BITS, KEY_POOL_LOW_WATERMARK, KEY_POOL_HIGH_WATERMARK, KEYGEN_WORKERS,
+                    PARALLEL_ENCRYPT_MIN)
+from rsa_utils import generate_rsa_keys, rsa_encrypt
+
+logger = logging.getLogger(__name__)
+
+
+class KeygenService:
+    # prime search is pure CPU and holds the GIL, so it runs in worker
+    # processes instead (one per core by default) to use the whole box
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queued = 0  # submit()ted keypairs not done yet
+
+    def _pool(self):
+        # processes only get started the first time we actually need them.
+        # "spawn" so the children don't inherit the flask worker's threads/locks
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def submit(self, bits):
+        try:
+            future = self._pool().submit(generate_rsa_keys, bits)
+        except BrokenProcessPool:
+            # a worker died (OOM kill etc), throw the pool away and start fresh
+            self.shutdown()
+            future = self._pool().submit(generate_rsa_keys, bits)
+        with self._lock:
+            self._queued += 1
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._queued -= 1
+
+    def busy(self):
+        # keypairs still queued or running (key pool refills etc). anything
+        # submitted now waits behind them, seconds' worth at 2048 bits
+        with self._lock:
+            return self._queued > 0
+
+    def generate(self, bits):
+        try:
+            return self.submit(bits).result()
+        except BrokenProcessPool:
+            # the worker died halfway through the job, once more on a fresh pool
+            self.shutdown()
+            return self.submit(bits).result()
+
+    def iter_many(self, k, bits):
+        # yields keypairs as soon as each one is done (not in submit order)
+        futures = [self.submit(bits) for _ in range(k)]
+        lost = 0
+        for future in as_completed(futures):
+            if isinstance(future.exception(), BrokenProcessPool):
+                lost += 1  # a worker died and took the rest of the pool with it
+            else:
+                yield future.result()
+        if lost:
+            # start a fresh pool and redo what was lost, once
+            self.shutdown()
+            for future in as_completed([self.submit(bits) for _ in range(lost)]):
+                yield future.result()
+
+    def generate_many(self, k, bits):
+        # bulk provisioning: k keypairs spread over all workers, sent in
+        # chunks so thousands of small keys don't pay one round trip each
+        chunksize = max(1, k // (self.max_workers * 4))
+        try:
+            return list(self._pool().map(generate_rsa_keys, [bits] * k, chunksize=chunksize))
+        except BrokenProcessPool:
+            self.shutdown()
+            return list(self._pool().map(generate_rsa_keys, [bits] * k, chunksize=chunksize))
+
+    def encrypt_many(self, messages, public_keys):
+        # messages[i] (a Caesar key) encrypted for public_keys[i] = (e, n), for
+        # every member of a group session or both sides of a pile of new
+        # sessions. same chunking as generate_many
+        chunksize = max(1, len(public_keys) // (self.max_workers * 4))
+        args = (messages, [e for e, _ in public_keys], [n for _, n in public_keys])
+        try:
+            return list(self._pool().map(rsa_encrypt, *args, chunksize=chunksize))
+        except BrokenProcessPool:
+            self.shutdown()
+            return list(self._pool().map(rsa_encrypt, *args, chunksize=chunksize))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+
+class KeyPool:
+    def __init__(self, bits, low_watermark=2, high_watermark=10, service=None):
+        if not 0 <= low_watermark <= high_watermark:
+            raise ValueError("need 0 <= low_watermark <= high_watermark")
+        self.bits = bits
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        # with a KeygenService the refills run in parallel in other processes,
+        # without one everything happens in this process
+        self._service = service
+        self._keys = queue.Queue(maxsize=high_watermark)
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        # counters for /metrics
+        self._generated = 0
+        self._busy_seconds = 0.0
+        self._hits = 0
+        self._misses = 0
+
+    def start(self):
+        # background filler thread, started once (daemon so it never blocks shutdown)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._refill_loop, name="key-pool", daemon=True)
+                self._thread.start()
+                self._wakeup.set()
+
+    def get(self):
+        # O(1) pop when the pool has keys, otherwise generate right here, in
+        # this process: the worker processes are busy with the refill batch
+        # and a submitted job would wait behind all of it
+        self.start()
+        try:
+            keys = self._keys.get_nowait()
+            with self._lock:
+                self._hits += 1
+        except queue.Empty:
+            with self._lock:
+                self._misses += 1
+            keys = generate_rsa_keys(self.bits)
+
+        # running low → wake the filler up
+        if self._keys.qsize() < self.low_watermark:
+            self._wakeup.set()
+        return keys
+
+    def _refill_loop(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # fill all the way up to the high watermark, then sleep again
+            # (only this thread puts keys in, so put() never blocks)
+            while self._keys.qsize() < self.high_watermark:
+                missing = self.high_watermark - self._keys.qsize()
+                start = time.perf_counter()
+                try:
+                    for keys in self._generate_batch(missing):
+                        self._keys.put(keys)
+                        with self._lock:
+                            self._generated += 1
+                except Exception:
+                    # don't let the filler thread die, get() still works without it
+                    logger.exception("key pool refill failed")
+                    time.sleep(1)
+                with self._lock:
+                    self._busy_seconds += time.perf_counter() - start
+
+    def _generate_batch(self, k):
+        if self._service:
+            return self._service.iter_many(k, self.bits)
+        return (generate_rsa_keys(self.bits) for _ in range(k))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "bits": self.bits,
+                "depth": self._keys.qsize(),
+                "low_watermark": self.low_watermark,
+                "high_watermark": self.high_watermark,
+                "generated": self._generated,
+                # keys per second while the filler is actually working
+                "refill_rate": self._generated / self._busy_seconds if self._busy_seconds else 0.0,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+# shared instances (one per worker process), like the caches in cache.py.
+# keypairs get generated in the background (in worker processes), register just grabs one
+keygen_service = KeygenService(KEYGEN_WORKERS) if KEYGEN_WORKERS else None
+key_pool = KeyPool(RSA_KEY_BITS, KEY_POOL_LOW_WATERMARK, KEY_POOL_HIGH_WATERMARK, service=keygen_service)
+
+
+def generate_many_keys(k, bits):
+    # bulk keygen: spread over the worker processes when we have them
+    if keygen_service:
+        return keygen_service.generate_many(k, bits)
+    return [generate_rsa_keys(bits) for _ in range(k)]
+
+
+def encrypt_many(messages, public_keys):
+    # rsa_encrypt(message, e, n) for each message and its (e, n), in the worker processes
+    # once there are enough of them to make up for shipping them over. not
+    # while they're generating keys though, queueing behind that is slower
+    # than just doing it here
+    if keygen_service and len(public_keys) >= PARALLEL_ENCRYPT_MIN and not keygen_service.busy():
+        return keygen_service.encrypt_many(messages, public_keys)
+    return [rsa_encrypt(message, e, n) for message, (e, n) in zip(messages, public_keys)]
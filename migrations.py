@@ -0,0 +1,281 @@
+# migrations.py
+# tiny alembic-free upgrades for databases created before a models.py change.
+# db.create_all() only creates missing tables, so anything added to existing
+# tables (indexes etc) goes here. every step is safe to run again
+
+from sqlalchemy import Integer, MetaData, inspect, text
+
+from models import db, User, Message, Session
+
+
+# indexes replaced by something better in models.py, per table
+OBSOLETE_INDEXES = {
+    "messages": ["ix_messages_receiver_sender_label"],  # now ix_messages_conversation
+}
+
+
+def drop_obsolete_indexes(engine):
+    dropped = []
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table_name, names in OBSOLETE_INDEXES.items():
+            if table_name not in existing_tables:
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table_name)}
+            for name in names:
+                if name in existing:
+                    conn.execute(text(f"DROP INDEX {name}"))
+                    dropped.append(name)
+    return dropped
+
+
+def create_missing_indexes(engine):
+    created = []
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue  # create_all will make it, indexes included
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                # a unique index fails here if the table already has duplicates,
+                # those need cleaning up by hand first
+                index.create(bind=engine)
+                created.append(index.name)
+    return created
+
+
+# messages/sessions used to store usernames, now they point at users.id.
+# table → (old username columns, the first one says it's unmigrated; old
+# columns that have to be unique together in the new table; copy SQL
+# selecting from the renamed old table)
+_USER_FK_MIGRATIONS = {
+    Message.__table__: (("sender", "receiver"), None, """
+        INSERT INTO messages (id, sender_id, receiver_id, session_label, encrypted_text)
+        SELECT m.id, s.id, r.id, m.session_label, m.encrypted_text
+        FROM messages_old m
+        JOIN users s ON s.name = m.sender
+        JOIN users r ON r.name = m.receiver
+    """),
+    Session.__table__: (("from_user", "to_user"), ("from_user", "to_user", "label"), """
+        INSERT INTO sessions (id, from_user_id, to_user_id, label, encrypted_for_sender, encrypted_for_receiver)
+        SELECT x.id, f.id, t.id, x.label, x.encrypted_for_sender, x.encrypted_for_receiver
+        FROM sessions_old x
+        JOIN users f ON f.name = x.from_user
+        JOIN users t ON t.name = x.to_user
+    """),
+}
+
+
+class MigrationError(Exception):
+    # a step can't go ahead without someone fixing the data first
+    pass
+
+
+def check_unique(conn, table_name, columns, shown=5):
+    # the new table has a unique index on these, so duplicates would fail the
+    # copy halfway (after the rename, which SQLite doesn't roll back)
+    names = ", ".join(columns)
+    duplicates = conn.execute(text(
+        f"SELECT {names}, COUNT(*) FROM {table_name} GROUP BY {names} HAVING COUNT(*) > 1"
+    )).all()
+    if duplicates:
+        examples = "; ".join(f"{tuple(row[:-1])} x{row[-1]}" for row in duplicates[:shown])
+        raise MigrationError(
+            f"{table_name} has {len(duplicates)} ({names}) combination(s) stored more than once "
+            f"(e.g. {examples}). they have to be unique now: delete or relabel the extra rows, "
+            f"then run upgrade-db again. nothing has been changed"
+        )
+
+def check_orphans(conn, table_name, name_columns, shown=10):
+    # rows naming a user that isn't in users anymore have no id to point at,
+    # the copy would leave them out, i.e. delete them for good
+    orphans = conn.execute(text(" UNION ".join(
+        f"SELECT x.{column} FROM {table_name} x LEFT JOIN users u ON u.name = x.{column} WHERE u.id IS NULL"
+        for column in name_columns
+    ))).scalars().all()
+    if orphans:
+        rows = conn.execute(text(f"SELECT COUNT(*) FROM {table_name} x WHERE " + " OR ".join(
+            f"NOT EXISTS (SELECT 1 FROM users u WHERE u.name = x.{column})" for column in name_columns
+        ))).scalar()
+        raise MigrationError(
+            f"{rows} row(s) in {table_name} name {len(orphans)} user(s) that don't exist anymore "
+            f"({', '.join(map(repr, orphans[:shown]))}{', ...' if len(orphans) > shown else ''}). "
+            f"converting would delete those rows: re-register the users or delete the rows, or "
+            f"run upgrade-db --drop-orphans to drop them. nothing has been changed"
+        )
+
+def _pending_user_fk_migrations(engine):
+    # (table, old name, resuming, name columns, unique columns, copy SQL) for every table still to convert
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    pending = []
+    for table, (name_columns, unique_columns, copy_sql) in _USER_FK_MIGRATIONS.items():
+        old_name = f"{table.name}_old"
+        if old_name in tables:
+            pending.append((table, old_name, True, name_columns, unique_columns, copy_sql))
+        elif table.name in tables and \
+                name_columns[0] in {column["name"] for column in inspector.get_columns(table.name)}:
+            pending.append((table, old_name, False, name_columns, unique_columns, copy_sql))
+    return pending
+
+def check_user_foreign_keys(engine, drop_orphans=False):
+    # everything migrate_user_foreign_keys needs from the data, checked up
+    # front. upgrade_db runs this before any step, so when it fails nothing
+    # in the DB has been touched yet
+    tables = set(inspect(engine).get_table_names())
+    with engine.connect() as conn:
+        for table, old_name, resuming, name_columns, unique_columns, _ in _pending_user_fk_migrations(engine):
+            if not drop_orphans:
+                check_orphans(conn, old_name if resuming else table.name, name_columns)
+            if unique_columns:
+                check_unique(conn, old_name if resuming else table.name, unique_columns)
+            if resuming and table.name in tables and \
+                    conn.execute(text(f"SELECT COUNT(*) FROM {table.name}")).scalar():
+                # the app has been writing to the new table since, copying the
+                # old ids over would clash with the new rows
+                raise MigrationError(
+                    f"{old_name} is left over from an interrupted upgrade, but {table.name} already "
+                    f"has rows again. move the {old_name} rows over by hand and drop it"
+                )
+
+def migrate_user_foreign_keys(engine, drop_orphans=False):
+    # rebuild each old table: rename it, create the new one, copy rows over
+    # with the names swapped for ids, drop the old one. rows pointing at a
+    # name that isn't in users anymore can't be converted: it stops before
+    # touching anything unless drop_orphans says to leave those rows out.
+    # if a run died after the rename (SQLite commits DDL as it goes), the next
+    # one finds <table>_old still there and finishes the copy from it
+    check_user_foreign_keys(engine, drop_orphans)  # every table, before any of them is touched
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    pending = _pending_user_fk_migrations(engine)
+
+    log = []
+    for table, old_name, resuming, _, _, copy_sql in pending:
+        with engine.begin() as conn:
+            if not resuming:
+                # index names are global, so the old ones go before the new table gets its own
+                for index in inspector.get_indexes(table.name):
+                    conn.execute(text(f"DROP INDEX {index['name']}"))
+                conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name}"))
+            if not resuming or table.name not in tables:
+                table.create(bind=conn)
+            conn.execute(text(copy_sql))
+            copied = conn.execute(text(f"SELECT COUNT(*) FROM {table.name}")).scalar()
+            total = conn.execute(text(f"SELECT COUNT(*) FROM {old_name}")).scalar()
+            conn.execute(text(f"DROP TABLE {old_name}"))
+            if conn.dialect.name == "postgresql":
+                # ids were copied as-is, move the sequence past them
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+                ))
+        log.append(f"migrated {table.name} to user ids ({copied}/{total} rows, "
+                   f"{total - copied} dropped for unknown users)")
+    return log
+
+
+# RSA numbers used to be BIGINT (63 bits max), now they're big-endian bytes (models.BigInt)
+_BIG_INT_COLUMNS = {
+    User.__table__: ["e", "n"],
+    Session.__table__: ["encrypted_for_sender", "encrypted_for_receiver"],
+}
+BIG_INT_BATCH_SIZE = 10000
+
+def migrate_big_int_columns(engine, batch_size=BIG_INT_BATCH_SIZE):
+    # one column at a time: add a binary column next to the old one, fill it
+    # batch by batch (keyset on id, one short transaction per batch, so memory
+    # stays flat, writers aren't locked out for the whole table and a run that
+    # got interrupted just picks up where it stopped), then swap it in
+    log = []
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    for table, names in _BIG_INT_COLUMNS.items():
+        if table.name not in existing_tables:
+            continue
+        columns = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+        for name in names:
+            column_type = table.c[name].type
+            new_name = f"{name}_bytes"
+            if name in columns and not isinstance(columns[name], Integer):
+                continue  # already migrated
+            if new_name not in columns:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {new_name} "
+                                      f"{column_type.compile(dialect=engine.dialect)}"))
+
+            copied = 0
+            if name in columns:
+                last_id = 0
+                while True:
+                    with engine.begin() as conn:
+                        rows = conn.execute(text(
+                            f"SELECT id, {name} FROM {table.name} WHERE id > :last_id AND {new_name} IS NULL "
+                            f"ORDER BY id LIMIT :limit"), {"last_id": last_id, "limit": batch_size}).all()
+                        if not rows:
+                            break
+                        conn.execute(text(f"UPDATE {table.name} SET {new_name} = :value WHERE id = :id"),
+                                     [{"id": row[0], "value": column_type.encode(row[1])} for row in rows])
+                    last_id = rows[-1][0]
+                    copied += len(rows)
+
+            with engine.begin() as conn:
+                if name in columns:
+                    conn.execute(text(f"ALTER TABLE {table.name} DROP COLUMN {name}"))
+                conn.execute(text(f"ALTER TABLE {table.name} RENAME COLUMN {new_name} TO {name}"))
+                if conn.dialect.name != "sqlite" and not table.c[name].nullable:
+                    conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {name} SET NOT NULL"))
+            log.append(f"converted {table.name}.{name} to bytes ({copied} rows)")
+
+        # SQLite can't add NOT NULL to an existing column, the whole table has
+        # to be rebuilt for that (also fixes tables converted before this was here)
+        if engine.dialect.name == "sqlite" and _lost_not_null(engine, table):
+            with engine.begin() as conn:
+                _rebuild_sqlite_table(conn, table)
+            log.append(f"rebuilt {table.name} to make its columns NOT NULL again")
+    return log
+
+
+def _lost_not_null(engine, table):
+    # same columns as the model, but some that should be NOT NULL aren't. a
+    # table with other columns (sessions before the user id migration) is
+    # left alone, that migration recreates it from the model anyway
+    columns = {column["name"]: column["nullable"] for column in inspect(engine).get_columns(table.name)}
+    if set(columns) != set(table.c.keys()):
+        return False
+    return any(columns[column.name] and not column.nullable for column in table.columns)
+
+def _rebuild_sqlite_table(conn, table):
+    # the way sqlite.org/lang_altertable.html says to change a column's
+    # constraints: create the new table under another name, copy the rows,
+    # drop the old one, rename the new one into place
+    metadata = MetaData()
+    for other in db.metadata.sorted_tables:
+        other.to_metadata(metadata)  # so foreign keys to users resolve
+    new = table.to_metadata(metadata, name=f"{table.name}_rebuild")
+    columns = ", ".join(table.c.keys())
+    # index names are global, so the old ones go before the new table gets its own
+    for index in inspect(conn).get_indexes(table.name):
+        conn.execute(text(f"DROP INDEX {index['name']}"))
+    new.create(bind=conn)
+    conn.execute(text(f"INSERT INTO {new.name} ({columns}) SELECT {columns} FROM {table.name}"))
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {new.name} RENAME TO {table.name}"))
+
+
+def upgrade_db(engine, drop_orphans=False):
+    # runs every step, returns what it did (for the CLI). big ints first, so
+    # the user id migration below copies sessions that are already in bytes
+    check_user_foreign_keys(engine, drop_orphans)  # fail before anything changes, not halfway through
+    log = migrate_big_int_columns(engine)
+    log += migrate_user_foreign_keys(engine, drop_orphans)
+    existing_tables = set(inspect(engine).get_table_names())
+    db.metadata.create_all(bind=engine)
+    log += [f"created table {table.name}" for table in db.metadata.sorted_tables
+            if table.name not in existing_tables]
+    log += [f"dropped index {name}" for name in drop_obsolete_indexes(engine)]
+    log += [f"created index {name}" for name in create_missing_indexes(engine)]
+    return log or ["database is up to date"]
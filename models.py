@@ -1,29 +1,185 @@
 # database table models
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import insert, select
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+from config import MAX_RSA_KEY_BITS
 
 db = SQLAlchemy()
 
+# RSA numbers (moduli, ciphertexts) are stored this wide
+KEY_BYTES = (MAX_RSA_KEY_BITS + 7) // 8
+
+class BigInt(TypeDecorator):
+    # non-negative int of any size as big-endian bytes. with a width every
+    # value is zero-padded to exactly that many bytes (fixed row size, no
+    # bit_length() per value), without one it takes as few bytes as it needs.
+    # reading doesn't care about the width, so changing it only affects new rows
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, width=None):
+        super().__init__(width)
+        self.width = width
+
+    def encode(self, value):
+        if value < 0:
+            raise ValueError("only non-negative integers can be stored")
+        width = self.width or max((value.bit_length() + 7) // 8, 1)
+        try:
+            return value.to_bytes(width, "big")
+        except OverflowError:
+            raise ValueError(f"{value.bit_length()}-bit value doesn't fit in {width} bytes") from None
+
+    @staticmethod
+    def decode(data):
+        return int.from_bytes(data, "big")
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else self.encode(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self.decode(value)
+
 class User(db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
-    e = db.Column(db.BigInteger, nullable=False)
-    n = db.Column(db.BigInteger, nullable=False)
+    e = db.Column(BigInt(), nullable=False)  # usually 65537, 3 bytes
+    n = db.Column(BigInt(KEY_BYTES), nullable=False)
 
 class Message(db.Model):
     __tablename__ = 'messages'
     id = db.Column(db.Integer, primary_key=True)
-    sender = db.Column(db.String(50), nullable=False)
-    receiver = db.Column(db.String(50), nullable=False)
+    sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    receiver_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     session_label = db.Column(db.String(100), nullable=False)
     encrypted_text = db.Column(db.Text, nullable=False)
 
+    sender = db.relationship('User', foreign_keys=[sender_id])
+    receiver = db.relationship('User', foreign_keys=[receiver_id])
+
+    __table_args__ = (
+        # read_messages filters on the first three (and on receiver alone) and
+        # pages through them by id, so the index hands back rows already in order
+        db.Index('ix_messages_conversation', 'receiver_id', 'sender_id', 'session_label', 'id'),
+    )
+
+    @staticmethod
+    def in_conversation(receiver_id, sender_id, session_label):
+        # filter for everything one user sent another in a session
+        return ((Message.receiver_id == receiver_id) & (Message.sender_id == sender_id) &
+                (Message.session_label == session_label))
+
+    @staticmethod
+    def inbox(receiver_id, after=0, limit=50, sender_id=None, session_label=None):
+        # select for the next limit+1 messages to receiver_id after the cursor
+        # (the extra row says whether there's another page), with sender names
+        query = (select(Message.id, User.name, Message.session_label, Message.encrypted_text)
+                 .join(User, User.id == Message.sender_id)
+                 .where(Message.receiver_id == receiver_id, Message.id > after))
+        if sender_id is not None:
+            query = query.where(Message.sender_id == sender_id)
+        if session_label:
+            query = query.where(Message.session_label == session_label)
+        return query.order_by(Message.id).limit(limit + 1)
+
+    @staticmethod
+    def insert_many(sender_id, receiver_id, session_label, encrypted_texts):
+        # a whole batch for one conversation as a single executemany INSERT
+        # (no ORM objects, no ids fetched back). caller commits
+        if not encrypted_texts:
+            return  # an empty executemany is a single INSERT ... DEFAULT VALUES
+        db.session.execute(insert(Message), [
+            {"sender_id": sender_id, "receiver_id": receiver_id,
+             "session_label": session_label, "encrypted_text": text}
+            for text in encrypted_texts
+        ])
+
 class Session(db.Model):
     __tablename__ = 'sessions'
     id = db.Column(db.Integer, primary_key=True)
-    from_user = db.Column(db.String(50), nullable=False)
-    to_user = db.Column(db.String(50), nullable=False)
+    from_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    to_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    label = db.Column(db.String(100), nullable=False)
+    encrypted_for_sender = db.Column(BigInt(KEY_BYTES), nullable=False)
+    encrypted_for_receiver = db.Column(BigInt(KEY_BYTES), nullable=False)
+
+    from_user = db.relationship('User', foreign_keys=[from_user_id])
+    to_user = db.relationship('User', foreign_keys=[to_user_id])
+
+    __table_args__ = (
+        # one label per (from, to) pair. a unique index instead of a constraint
+        # so migrations.py can add it to old SQLite tables too
+        db.Index('uq_sessions_from_to_label', 'from_user_id', 'to_user_id', 'label', unique=True),
+        # "who do I have sessions with" looks up the other direction too
+        db.Index('ix_sessions_to_user', 'to_user_id'),
+    )
+
+    def key_for(self, user_id):
+        # the Caesar key encrypted for whichever side user_id is on
+        return self.encrypted_for_sender if self.from_user_id == user_id else self.encrypted_for_receiver
+
+    @staticmethod
+    def between(user_a_id, user_b_id):
+        # filter for sessions between two users, in either direction
+        return (((Session.from_user_id == user_a_id) & (Session.to_user_id == user_b_id)) |
+                ((Session.from_user_id == user_b_id) & (Session.to_user_id == user_a_id)))
+
+class GroupSession(db.Model):
+    # a session for any number of users: one Caesar key, encrypted once per
+    # member (session_members). pairwise sessions stay in Session
+    __tablename__ = 'group_sessions'
+    id = db.Column(db.Integer, primary_key=True)
+    creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     label = db.Column(db.String(100), nullable=False)
-    encrypted_for_sender = db.Column(db.BigInteger, nullable=False)
-    encrypted_for_receiver = db.Column(db.BigInteger, nullable=False)
+
+    creator = db.relationship('User')
+
+    __table_args__ = (
+        db.Index('uq_group_sessions_creator_label', 'creator_id', 'label', unique=True),
+    )
+
+class SessionMember(db.Model):
+    __tablename__ = 'session_members'
+    session_id = db.Column(db.Integer, db.ForeignKey('group_sessions.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    encrypted_key = db.Column(BigInt(KEY_BYTES), nullable=False)
+
+    __table_args__ = (
+        # "which groups am I in"
+        db.Index('ix_session_members_user', 'user_id'),
+    )
+
+    @staticmethod
+    def insert_many(session_id, encrypted_keys):
+        # every member's row in one executemany INSERT ({user_id: encrypted key}). caller commits
+        db.session.execute(insert(SessionMember), [
+            {"session_id": session_id, "user_id": user_id, "encrypted_key": key}
+            for user_id, key in encrypted_keys.items()
+        ])
+
+class GroupMessage(db.Model):
+    # a message to a group session, stored once for everyone (all members
+    # share the Caesar key, so there's nothing per member to keep)
+    __tablename__ = 'group_messages'
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('group_sessions.id'), nullable=False)
+    sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    encrypted_text = db.Column(db.Text, nullable=False)
+
+    __table_args__ = (
+        # reading a group pages through it by id, same as ix_messages_conversation
+        db.Index('ix_group_messages_session', 'session_id', 'id'),
+    )
+
+    @staticmethod
+    def insert_many(session_id, sender_id, encrypted_texts):
+        # a batch as a single executemany INSERT, like Message.insert_many. caller commits
+        if not encrypted_texts:
+            return
+        db.session.execute(insert(GroupMessage), [
+            {"session_id": session_id, "sender_id": sender_id, "encrypted_text": text}
+            for text in encrypted_texts
+        ])
@@ -0,0 +1,155 @@
+# provisioning.py
+# bulk user registration: one IN query to find who already exists, keys made
+# in parallel, one bulk insert + one commit, private keys streamed back as CSV.
+# same idea for sessions between lots of (from, to, label) pairs
+
+import csv
+import io
+import random
+
+from sqlalchemy import insert
+
+from cache import IN_CHUNK_SIZE, SessionInfo, public_keys, sessions
+from models import db, User, Session
+
+MAX_NAME_LENGTH = 50  # same as users.name
+DEFAULT_LABEL = "default"
+MAX_LABEL_LENGTH = 100  # same as sessions.label
+
+CSV_FIELDS = ["name", "status", "e", "n", "d", "p", "q"]
+SESSION_CSV_FIELDS = ["from", "to", "label", "status", "error", "from_key", "to_key"]
+
+
+def read_names_csv(lines):
+    # first column of every row is a username, a "name" header row is skipped
+    names = []
+    for row in csv.reader(lines):
+        if row and row[0].strip() and row[0].strip().lower() != "name":
+            names.append(row[0].strip())
+    return names
+
+
+def existing_names(names):
+    found = set()
+    for i in range(0, len(names), IN_CHUNK_SIZE):
+        chunk = names[i:i + IN_CHUNK_SIZE]
+        found.update(name for (name,) in db.session.query(User.name).filter(User.name.in_(chunk)))
+    return found
+
+
+def provision_users(names, bits, generate_many):
+    # returns one result row per requested name (created / exists / invalid),
+    # in the order they were given. generate_many(k, bits) -> list of keypairs
+    names = list(dict.fromkeys(name.strip() for name in names))  # dedupe, keep order
+    valid = [name for name in names if name and len(name) <= MAX_NAME_LENGTH]
+    taken = existing_names(valid)
+    new_names = [name for name in valid if name not in taken]
+
+    keys_by_name = dict(zip(new_names, generate_many(len(new_names), bits))) if new_names else {}
+    if keys_by_name:
+        db.session.execute(insert(User), [
+            {"name": name, "e": keys["e"], "n": keys["n"]} for name, keys in keys_by_name.items()
+        ])
+        db.session.commit()
+
+    results = []
+    for name in names:
+        if name in keys_by_name:
+            keys = keys_by_name[name]
+            results.append({"name": name, "status": "created", **{k: keys[k] for k in ("e", "n", "d", "p", "q")}})
+        elif name in taken:
+            results.append({"name": name, "status": "exists"})
+        else:
+            results.append({"name": name, "status": "invalid"})
+    return results
+
+
+def read_session_csv(lines):
+    # from,to[,label] per row (no label = "default"), a "from" header row is skipped
+    triples = []
+    for row in csv.reader(lines):
+        row = [cell.strip() for cell in row]
+        if len(row) < 2 or row[0].lower() == "from":
+            continue
+        triples.append((row[0], row[1], (row[2] if len(row) > 2 else "") or DEFAULT_LABEL))
+    return triples
+
+
+def provision_sessions(triples, encrypt_many):
+    # one result per (from, to, label) triple, in order: created / exists
+    # (either direction, asking twice gives the same keys) / invalid /
+    # not_found, with the Caesar key encrypted for both sides. every public
+    # key comes from one IN query, existing sessions from one more, the new
+    # keys are encrypted in one encrypt_many(messages, public_keys) call
+    # (worker processes for big batches) and go in with one INSERT + commit.
+    # IntegrityError if one of them got created concurrently, caller rolls back
+    keys = public_keys.get_many([name for triple in triples for name in triple[:2] if isinstance(name, str)])
+    known = sessions.get_many([(keys[f].id, keys[t].id, label) for f, t, label in triples
+                               if f in keys and t in keys and label])
+
+    results, new, pending = [], {}, []
+    for from_user, to_user, label in triples:
+        result = {"from": from_user, "to": to_user, "label": label}
+        results.append(result)
+        if not from_user or not to_user or not label or len(label) > MAX_LABEL_LENGTH:
+            result.update(status="invalid", error="need from, to and an optional label")
+            continue
+        if from_user == to_user:
+            result.update(status="invalid", error="cannot create a session with yourself")
+            continue
+        sender, receiver = keys.get(from_user), keys.get(to_user)
+        if not sender or not receiver:
+            result.update(status="not_found", error="one or both users were not found")
+            continue
+
+        session = known.get((sender.id, receiver.id, label))
+        if session is not None:
+            result["status"] = "exists"
+            pending.append((result, session, sender, receiver))
+            continue
+        # a pair that shows up twice in one batch gets one session
+        pair = (min(sender.id, receiver.id), max(sender.id, receiver.id), label)
+        result["status"] = "exists" if pair in new else "created"
+        new.setdefault(pair, (sender, receiver, label))
+        pending.append((result, pair, sender, receiver))
+
+    created = {}
+    if new:
+        caesar_keys = [random.randint(0, 25) for _ in new]
+        encrypted = encrypt_many([key for key in caesar_keys for _ in range(2)],
+                                 [(user.e, user.n) for sender, receiver, _ in new.values() for user in (sender, receiver)])
+        for i, (pair, (sender, receiver, label)) in enumerate(new.items()):
+            created[pair] = SessionInfo(None, sender.id, receiver.id, label, encrypted[2 * i], encrypted[2 * i + 1])
+        db.session.execute(insert(Session), [
+            {"from_user_id": info.from_user_id, "to_user_id": info.to_user_id, "label": info.label,
+             "encrypted_for_sender": info.encrypted_for_sender, "encrypted_for_receiver": info.encrypted_for_receiver}
+            for info in created.values()
+        ])
+        db.session.commit()
+
+    for result, session, sender, receiver in pending:
+        session = created.get(session, session)  # pair of a new one → its SessionInfo
+        result["caesar_key_encrypted"] = {result["from"]: session.key_for(sender.id),
+                                          result["to"]: session.key_for(receiver.id)}
+    return results
+
+
+def session_results_csv(results):
+    # provision_sessions() results as CSV, both encrypted keys in their own column
+    return results_csv(({**result, "from_key": result.get("caesar_key_encrypted", {}).get(result["from"], ""),
+                         "to_key": result.get("caesar_key_encrypted", {}).get(result["to"], "")}
+                        for result in results), SESSION_CSV_FIELDS)
+
+
+def results_csv(results, fields=CSV_FIELDS):
+    # generator of CSV lines, so big batches can be streamed out as they're written
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, restval="", extrasaction="ignore")
+    writer.writeheader()
+    for row in results:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.getvalue():
+        yield buffer.getvalue()
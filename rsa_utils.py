@@ -1,68 +1,237 @@
 # rsa_utils.py
 
+import os
 import random
-from math import gcd
-
-
-def is_prime(n):
+from math import gcd, prod
+
+# keys are secret stuff, so use the OS randomness instead of the default PRNG
+_rng = random.SystemRandom()
+
+# big-number backend, picked once at import: gmpy2 (GMP's powmod / is_prime /
+# invert) if it's installed (pip install gmpy2), plain Python ints otherwise.
+# RSA_BACKEND=python forces the pure-Python code, RSA_BACKEND=gmpy2 fails
+# right here if gmpy2 is missing instead of quietly running slow.
+# either way everything below takes and returns plain ints
+RSA_BACKEND = os.environ.get("RSA_BACKEND", "auto")
+
+def _load_gmpy2(backend):
+    if backend not in ("auto", "gmpy2", "python"):
+        raise ValueError(f"RSA_BACKEND must be auto, gmpy2 or python, not {backend!r}")
+    if backend == "python":
+        return None
+    try:
+        import gmpy2
+    except ImportError:
+        if backend == "gmpy2":
+            raise
+        return None
+    return gmpy2
+
+_gmpy2 = _load_gmpy2(RSA_BACKEND)
+BACKEND = "gmpy2" if _gmpy2 else "python"
+
+if _gmpy2:
+    def _powmod(base, exp, mod):
+        return int(_gmpy2.powmod(base, exp, mod))
+else:
+    _powmod = pow
+
+# standard public exponent (prime, so gcd(e, p-1) == 1 just means (p-1) % e != 0)
+DEFAULT_E = 65537
+DEFAULT_KEY_BITS = 2048
+
+
+def _small_primes(limit):
+    # plain sieve of eratosthenes, only runs once at import
+    sieve = bytearray([1]) * (limit + 1)
+    sieve[0:2] = b"\x00\x00"
+    for i in range(2, int(limit**0.5) + 1):
+        if sieve[i]:
+            sieve[i*i::i] = bytearray(len(sieve[i*i::i]))
+    return [i for i, is_p in enumerate(sieve) if is_p]
+
+SMALL_PRIMES = _small_primes(2000)
+_SMALL_PRIMES_SET = frozenset(SMALL_PRIMES)
+# one big number = product of all small primes, so a single gcd() call
+# tells us if a candidate has any small factor (way cheaper than Miller-Rabin)
+_SMALL_PRIMES_PRODUCT = prod(SMALL_PRIMES)
+
+
+def _miller_rabin_rounds(bits):
+    # rounds needed for < 2^-80 error on random candidates (HAC table 4.4)
+    for min_bits, rounds in ((1300, 2), (850, 3), (650, 4), (350, 8), (250, 12), (150, 18), (100, 27)):
+        if bits >= min_bits:
+            return rounds
+    return 40
+
+# below this bound, testing these 13 bases is a proof, not a guess
+# (Sorenson & Webster 2015), so small keys need no random rounds at all
+_DETERMINISTIC_LIMIT = 3317044064679887385961981
+_DETERMINISTIC_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
+def _miller_rabin(n, rounds):
+    # write n-1 as d * 2^s with d odd
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    if n < _DETERMINISTIC_LIMIT:
+        bases = _DETERMINISTIC_BASES
+    else:
+        bases = (_rng.randrange(2, n - 1) for _ in range(rounds))
+
+    for a in bases:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False  # a is a witness, n is definitely composite
+    return True  # probably prime
+
+def _gmpy2_probable_prime(n, rounds):
+    # GMP runs a Baillie-PSW test first, everything past 24 reps is extra
+    # Miller-Rabin rounds on top, so this is at least as strict as ours
+    return bool(_gmpy2.is_prime(n, 24 + rounds))
+
+_probable_prime = _gmpy2_probable_prime if _gmpy2 else _miller_rabin
+
+def is_prime(n, rounds=None):
     if n <= 1:
         return False
-    for i in range(2, int(n**0.5)+1):
-        if n % i == 0:
-            return False
-    return True
-
-def generate_two_primes():
-    primes = [i for i in range(10, 100) if is_prime(i)] # list of primes with 2 digits
-
-    # choose p and q randomly
-    p = random.choice(primes)
-    q = random.choice(primes)
+    if n in _SMALL_PRIMES_SET:
+        return True
+    # sieve prefilter: anything with a small factor is out
+    if gcd(n, _SMALL_PRIMES_PRODUCT) != 1:
+        return False
+    # no factor below 2000 and n < 2000^2 means n is prime, no need for MR
+    if n < SMALL_PRIMES[-1] ** 2:
+        return True
+    return _probable_prime(n, rounds or _miller_rabin_rounds(n.bit_length()))
+
+def generate_prime(bits, e=DEFAULT_E):
+    if bits < 8:
+        raise ValueError("prime size must be at least 8 bits")
+    while True:
+        # top two bits set so p*q has exactly 2*bits bits, low bit set so it's odd
+        candidate = _rng.getrandbits(bits) | (3 << (bits - 2)) | 1
+        # skip primes where e has no inverse mod p-1
+        if e and (candidate - 1) % e == 0:
+            continue
+        if is_prime(candidate):
+            return candidate
+
+def generate_two_primes(bits=DEFAULT_KEY_BITS):
+    # choose p and q so that n = p*q has `bits` bits
+    p = generate_prime(bits // 2)
+    q = generate_prime(bits - bits // 2)
 
     #make sure they are not the same
     while q == p:
-        q = random.choice(primes)
+        q = generate_prime(bits - bits // 2)
     return p, q
 
-def modinv(e, phi):
-    # function that does extended euclidean algo
-    def egcd(a, b):
-        # if a is 0, gcd is b and coeffs are (0,1) cuz 0*a + 1*b = b
-        if a == 0: # base case
-            return (b, 0, 1)
-        # recursively call egcd with (b % a, a) until we hit base case
-        gcd, y, x = egcd(b % a, a)
-        # backtrack and compute the x, y for current step using the previous ones
-        return (gcd, x - (b // a) * y, y)
-
-    # get gcd and the modular inverse candidate x
-    gcd, x, _ = egcd(e, phi)
+# pow(x, -1, m) computes modular inverses natively since python 3.8
+try:
+    pow(2, -1, 3)
+    _HAS_POW_INVERSE = True
+except ValueError:
+    _HAS_POW_INVERSE = False
+
+def _egcd_modinv(e, phi):
+    # iterative extended euclidean algo (no recursion, so no recursion limit
+    # on big numbers). invariant: old_r == old_x * e (mod phi)
+    old_r, r = e, phi
+    old_x, x = 1, 0
+    while r:
+        quotient = old_r // r
+        old_r, r = r, old_r - quotient * r
+        old_x, x = x, old_x - quotient * x
 
     # if gcd isn’t 1, that means e and phi aren't coprime so no inverse
-    if gcd != 1:
+    if old_r != 1:
         raise Exception("Modular inverse does not exist")
 
     # return x mod phi so it’s in the positive range
-    return x % phi
+    return old_x % phi
 
-def generate_rsa_keys():
-    p, q = generate_two_primes()
+def modinv(e, phi):
+    if _gmpy2:
+        try:
+            return int(_gmpy2.invert(e, phi))
+        except ZeroDivisionError:
+            raise Exception("Modular inverse does not exist") from None
+    if not _HAS_POW_INVERSE:
+        return _egcd_modinv(e, phi)
+    try:
+        return pow(e, -1, phi)
+    except ValueError:
+        # same error as the manual version, callers shouldn't care which one ran
+        raise Exception("Modular inverse does not exist") from None
+
+def generate_rsa_keys(bits=DEFAULT_KEY_BITS):
+    if bits < 16:
+        raise ValueError("key size must be at least 16 bits")
+    p, q = generate_two_primes(bits)
     n = p * q
     phi = (p - 1) * (q - 1) # phi(n)
 
-    # Choose e (common values are 3, 5, 17, 257, 65537)
-    e = 3
-    while gcd(e, phi) != 1: # find e that is coprime with phi(n)
-        e += 2
+    # Choose e: 65537 normally (generate_prime already made sure it's coprime
+    # with phi), tiny demo keys fall back to the smallest odd e that works
+    e = DEFAULT_E
+    if e >= phi:
+        e = 3
+        while gcd(e, phi) != 1: # find e that is coprime with phi(n)
+            e += 2
 
     d = modinv(e, phi) # get priv key
-    return {"p": p, "q": q, "e": e, "d": d, "n": n}
+    return {"p": p, "q": q, "e": e, "d": d, "n": n, **crt_private_key(d, p, q)}
+
+def crt_private_key(d, p, q):
+    # precomputed CRT parts (same names as PKCS#1) so decryption can work
+    # mod p and mod q separately, half-size numbers are ~3-4x faster overall
+    return {
+        "d": d,
+        "p": p,
+        "q": q,
+        "dP": d % (p - 1),
+        "dQ": d % (q - 1),
+        "qInv": modinv(q, p),
+    }
+
+def private_key(d, n, p=None, q=None):
+    # d alone is enough, but if p and q are given too we can build the
+    # CRT key and decrypt faster
+    if not p or not q:
+        return int(d)
+    p, q = int(p), int(q)
+    if p * q != n:
+        raise ValueError("p * q doesn't match your public key")
+    return crt_private_key(int(d), p, q)
 
 def rsa_encrypt(message, e, n):
-    return pow(message, e, n) # calculates M^e mod n
-
-def rsa_decrypt(cipher: int, d: int, n: int) -> int:
-    return pow(cipher, d, n)  # calculates C^d mod n
+    return _powmod(message, e, n) # calculates M^e mod n
+
+def rsa_decrypt_crt(cipher: int, key: dict) -> int:
+    # garner's formula: m = m2 + q * (qInv * (m1 - m2) mod p)
+    p, q = key["p"], key["q"]
+    m1 = _powmod(cipher % p, key["dP"], p)
+    m2 = _powmod(cipher % q, key["dQ"], q)
+    h = key["qInv"] * (m1 - m2) % p
+    return m2 + h * q
+
+def rsa_decrypt(cipher: int, d: int | dict, n: int) -> int:
+    # d is either the plain private exponent or a private key dict
+    # (from generate_rsa_keys / crt_private_key), which gets the CRT fast path
+    if isinstance(d, dict):
+        if all(k in d for k in ("p", "q", "dP", "dQ", "qInv")):
+            return rsa_decrypt_crt(cipher, d)
+        d = d["d"]
+    return _powmod(cipher, d, n)  # calculates C^d mod n
 
 
 if __name__ == "__main__":
@@ -71,7 +240,7 @@ if __name__ == "__main__":
 
     msg = 12  # Caesar key to encrypt
     encrypted = rsa_encrypt(msg, keys['e'], keys['n'])
-    decrypted = rsa_decrypt(encrypted, keys['d'], keys['n'])
+    decrypted = rsa_decrypt(encrypted, keys, keys['n'])  # full key -> CRT
 
     print(f"\nOriginal Message: {msg}")
     print(f"Encrypted: {encrypted}")
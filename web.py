@@ -0,0 +1,547 @@
+# web.py
+# the HTML pages (register / sessions / send / read), /metrics and the CLI
+# commands, as a blueprint that app.create_app() registers
+
+from flask import (Blueprint, Response, request, render_template, stream_template, stream_with_context,
+                   redirect, url_for, flash, jsonify)
+from config import (RSA_KEY_BITS, MAX_REGISTER_BATCH_SIZE, MAX_API_BATCH_SIZE, MESSAGE_PAGE_SIZE,
+                    MAX_MESSAGE_PAGE_SIZE, MESSAGE_STREAM_BATCH_SIZE)
+from models import db, User, Message, Session
+from rsa_utils import rsa_encrypt, BACKEND as RSA_BACKEND
+from keygen import keygen_service, key_pool, generate_many_keys, encrypt_many
+from caesar_utils import caesar_encrypt, caesar_decrypt_many
+from provisioning import (provision_users, read_names_csv, results_csv, provision_sessions, read_session_csv,
+                          session_results_csv, DEFAULT_LABEL)
+from migrations import upgrade_db, MigrationError
+from cache import user_ids, public_keys, sessions, session_keys
+from inbox import inbox
+from dbpool import pool_monitor
+from sqlalchemy.exc import IntegrityError
+import click
+import json
+import random
+
+# cli_group=None: commands stay top level (flask --app app upgrade-db)
+web = Blueprint("web", __name__, cli_group=None)
+
+# start filling the pool on the first request (not at import, so CLI commands don't spin it up)
+@web.before_app_request
+def warm_key_pool():
+    key_pool.start()
+
+def decrypt_session_key(session, user, d):
+    # Caesar key for this user's side of the session (CRT if the form also
+    # has p and q), from the cache if they already decrypted it with the same d
+    return session_keys.decrypt(session, user, d, request.form.get("p"), request.form.get("q"))
+
+def fetch_message_page(receiver_id, sender_id, session_label, after=0, page_size=MESSAGE_PAGE_SIZE):
+    # keyset pagination: next page_size messages with id > after, oldest first.
+    # cost only depends on the page size, not on how long the session is
+    rows = db.session.query(Message.id, Message.encrypted_text).filter(
+        Message.in_conversation(receiver_id, sender_id, session_label),
+        Message.id > after,
+    ).order_by(Message.id).limit(page_size + 1).all()
+
+    # fetched one extra row just to know if there's another page
+    next_cursor = rows[page_size - 1].id if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+def decrypt_rows(rows, caesar_key):
+    # (id, encrypted_text) rows → dicts for the template / JSON, decrypted in
+    # one batch since the whole session uses the same key
+    encrypted_texts = [row.encrypted_text for row in rows]
+    decrypted_texts = caesar_decrypt_many(encrypted_texts, caesar_key)
+    return [
+        {"id": row.id, "encrypted": enc, "decrypted": dec}
+        for row, enc, dec in zip(rows, encrypted_texts, decrypted_texts)
+    ]
+
+def iter_message_history(receiver_id, sender_id, session_label, caesar_key, after=0):
+    # the whole conversation after the cursor, straight off a server-side
+    # cursor (yield_per) and decrypted batch by batch, so memory stays flat
+    # no matter how long the session is
+    query = db.session.query(Message.id, Message.encrypted_text).filter(
+        Message.in_conversation(receiver_id, sender_id, session_label),
+        Message.id > after,
+    ).order_by(Message.id).yield_per(MESSAGE_STREAM_BATCH_SIZE)
+
+    batch = []
+    for row in query:
+        batch.append(row)
+        if len(batch) == MESSAGE_STREAM_BATCH_SIZE:
+            yield from decrypt_rows(batch, caesar_key)
+            batch = []
+    yield from decrypt_rows(batch, caesar_key)
+
+# sanity check route — loads home page just to make sure everything's alive
+@web.route("/")
+def home():
+    return render_template("home.html")
+
+# Register Page (GET + POST)
+@web.route("/register", methods=["GET", "POST"])
+def register():
+    if request.method == "POST":
+        # get the name user typed in
+        name = request.form.get("name")
+
+        # if name is empty, just tell them to type smth
+        if not name:
+            flash("⚠️ Please enter your name.")
+            return render_template("register.html")
+
+        # check if the name is already in the DB
+        if User.query.filter_by(name=name).first():
+            flash("⚠️ User already exists!")
+            return render_template("register.html")
+
+        # grab RSA keys for the new user (pre-generated, or made on the spot if the pool is empty)
+        keys = key_pool.get()
+        e = keys['e']     # public exponent
+        d = keys['d']     # private key (only shown to user)
+        n = keys['n']     # modulus
+        p, q = keys['p'], keys['q']  # optional part of the private key, speeds up decryption
+
+        # save only what's public to DB (name, e, n)
+        new_user = User(name=name, e=e, n=n)
+        db.session.add(new_user)
+        db.session.commit()
+        public_keys.invalidate(name)
+        user_ids.remember(name, new_user.id)
+
+        # show success msg + the keys to user
+        flash(f"✅ Registered user: {name}")
+        return render_template("register.html", d=d, e=e, n=n, p=p, q=q, generated=True)
+
+    # if GET request, just show the register page
+    return render_template("register.html")
+
+
+def uploaded_lines(upload):
+    # an uploaded CSV as lines of text, None if it isn't UTF-8
+    # (utf-8-sig: also drops the BOM Excel puts in front of "CSV UTF-8" exports)
+    try:
+        return upload.read().decode("utf-8-sig").splitlines()
+    except UnicodeDecodeError:
+        return None
+
+# Bulk registration: JSON list of names ({"names": [...]} or just [...]) or a CSV
+# upload (field "file", first column = name). Answers with a CSV download of
+# everyone's keys + a status per name (created / exists / invalid). keys are
+# generated in the request, so uploads are capped at MAX_REGISTER_BATCH_SIZE
+@web.route("/bulk-register", methods=["POST"])
+def bulk_register():
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        names = payload.get("names") if isinstance(payload, dict) else payload
+    elif "file" in request.files:
+        lines = uploaded_lines(request.files["file"])
+        names = read_names_csv(lines) if lines is not None else None
+    else:
+        names = None
+
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return jsonify({"error": "send a JSON list of names or a CSV file (UTF-8)"}), 400
+    if len(names) > MAX_REGISTER_BATCH_SIZE:
+        return jsonify({"error": f"at most {MAX_REGISTER_BATCH_SIZE} names per upload, "
+                                 f"use flask provision-users for bigger lists"}), 413
+
+    try:
+        results = provision_users(names, RSA_KEY_BITS, generate_many_keys)
+        public_keys.invalidate(*(row["name"] for row in results if row["status"] == "created"))
+    except IntegrityError:
+        # someone registered one of these names in the meantime
+        db.session.rollback()
+        return jsonify({"error": "some users were registered concurrently, try again"}), 409
+
+    return Response(results_csv(results), mimetype="text/csv",
+                    headers={"Content-Disposition": "attachment; filename=keys.csv"})
+
+
+# bring an existing database up to date with models.py: flask --app app upgrade-db
+@web.cli.command("upgrade-db")
+@click.option("--drop-orphans", is_flag=True,
+              help="delete old messages/sessions naming users that don't exist anymore instead of stopping")
+def upgrade_db_command(drop_orphans):
+    try:
+        log = upgrade_db(db.engine, drop_orphans)
+    except MigrationError as e:
+        raise click.ClickException(str(e))  # exits non-zero, so a release step stops the deploy
+    for line in log:
+        click.echo(line)
+
+
+# same thing from the command line: flask --app app provision-users names.csv -o keys.csv
+@web.cli.command("provision-users")
+@click.argument("names_file", type=click.File("r", encoding="utf-8-sig"))
+@click.option("-o", "--output", type=click.File("w"), default="-", help="where to write the keys CSV")
+def provision_users_command(names_file, output):
+    results = provision_users(read_names_csv(names_file), RSA_KEY_BITS, generate_many_keys)
+    for chunk in results_csv(results):
+        output.write(chunk)
+    created = sum(1 for row in results if row["status"] == "created")
+    click.echo(f"✅ {created} created, {len(results) - created} skipped", err=True)
+
+
+def session_triple(item):
+    # {"from", "to", "label"?} or [from, to, label?] → (from, to, label),
+    # anything else (or non-string names) comes out as an invalid item
+    if isinstance(item, dict):
+        item = [item.get("from"), item.get("to"), item.get("label")]
+    if not isinstance(item, list) or len(item) < 2:
+        return (None, None, None)
+    from_user, to_user, label = (item + [None])[:3]
+    triple = (from_user, to_user, label or DEFAULT_LABEL)
+    return triple if all(isinstance(value, str) for value in triple) else (None, None, None)
+
+# Bulk session setup: JSON list of {"from", "to", "label"?} objects (or
+# [from, to, label?] lists) or a CSV upload (field "file", from,to,label per row).
+# Answers with a CSV of every pair's status (created / exists / invalid /
+# not_found) and both encrypted Caesar keys
+@web.route("/bulk-create-sessions", methods=["POST"])
+def bulk_create_sessions():
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        triples = [session_triple(item) for item in payload] if isinstance(payload, list) else None
+    elif "file" in request.files:
+        lines = uploaded_lines(request.files["file"])
+        triples = read_session_csv(lines) if lines is not None else None
+    else:
+        triples = None
+
+    if triples is None:
+        return jsonify({"error": "send a JSON list of {from, to, label} or a CSV file (UTF-8)"}), 400
+    if len(triples) > MAX_API_BATCH_SIZE:
+        return jsonify({"error": f"at most {MAX_API_BATCH_SIZE} pairs per upload, "
+                                 f"use flask provision-sessions for bigger lists"}), 413
+
+    try:
+        results = provision_sessions(triples, encrypt_many)
+    except IntegrityError:
+        # someone created one of these sessions in the meantime
+        db.session.rollback()
+        return jsonify({"error": "some sessions were created concurrently, try again"}), 409
+
+    return Response(session_results_csv(results), mimetype="text/csv",
+                    headers={"Content-Disposition": "attachment; filename=sessions.csv"})
+
+
+# same thing from the command line: flask --app app provision-sessions pairs.csv -o sessions.csv
+@web.cli.command("provision-sessions")
+@click.argument("pairs_file", type=click.File("r", encoding="utf-8-sig"))
+@click.option("-o", "--output", type=click.File("w"), default="-", help="where to write the results CSV")
+def provision_sessions_command(pairs_file, output):
+    results = provision_sessions(read_session_csv(pairs_file), encrypt_many)
+    for chunk in session_results_csv(results):
+        output.write(chunk)
+    created = sum(1 for row in results if row["status"] == "created")
+    click.echo(f"✅ {created} created, {len(results) - created} skipped", err=True)
+
+
+@web.route("/create-session", methods=["GET", "POST"])
+def create_session():
+    if request.method == "POST":
+        # get all form values
+        from_user = request.form.get("from_user")
+        to_user = request.form.get("to_user")
+        session_label = request.form.get("session_label")
+
+        # check if any field is missing
+        if not from_user or not to_user or not session_label:
+            flash("⚠️ Please fill out all fields.")
+            return render_template("create_session.html")
+
+        # no messaging yourself bruh
+        if from_user == to_user:
+            flash("⚠️ Cannot create a session with yourself.")
+            return render_template("create_session.html")
+
+        # find sender + receiver in DB (both in one query)
+        users = public_keys.get_many([from_user, to_user])
+        sender = users.get(from_user)
+        receiver = users.get(to_user)
+
+        # if one doesn’t exist, abort
+        if not sender or not receiver:
+            flash("❌ One or both users were not found.")
+            return render_template("create_session.html")
+
+        # a label names one session between two users, whichever side made it.
+        # the unique index only covers (from, to, label), so look the other way too
+        if sessions.get(sender.id, receiver.id, session_label):
+            flash("⚠️ A session with this label already exists.")
+            return render_template("create_session.html")
+
+        # generate a Caesar key (just a number between 0-25)
+        session_key = random.randint(0, 25)
+
+        # encrypt the Caesar key for both users using their public RSA keys
+        encrypted_for_sender = rsa_encrypt(session_key, sender.e, sender.n)
+        encrypted_for_receiver = rsa_encrypt(session_key, receiver.e, receiver.n)
+
+        # save this session to the DB
+        new_session = Session(
+            from_user_id=sender.id,
+            to_user_id=receiver.id,
+            label=session_label,
+            encrypted_for_sender=encrypted_for_sender,
+            encrypted_for_receiver=encrypted_for_receiver
+        )
+        db.session.add(new_session)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # unique index on (from_user, to_user, label) → someone just took this label
+            db.session.rollback()
+            flash("⚠️ A session with this label already exists.")
+            return render_template("create_session.html")
+
+        # show both encrypted keys (for debugging or just info)
+        encrypted_keys = {
+            from_user: encrypted_for_sender,
+            to_user: encrypted_for_receiver
+        }
+
+        flash(f"✅ Session created! Caesar key encrypted below.")
+        return render_template("create_session.html",
+                               from_user=from_user,
+                               to_user=to_user,
+                               session_label=session_label,
+                               encrypted_keys=encrypted_keys)
+
+    # GET request → just show the session creation form
+    return render_template("create_session.html")
+
+
+@web.route("/send-message", methods=["GET", "POST"])
+def send_message():
+    if request.method == "POST":
+        # get all inputs from form
+        username = request.form.get("username")
+        d = request.form.get("d")  # private key
+        p = request.form.get("p")  # optional CRT primes
+        q = request.form.get("q")
+        target_user = request.form.get("target_user")
+        session_label = request.form.get("session_label")
+        plaintext = request.form.get("plaintext")
+
+        # Step 1: User just entered name and private key, nothing else yet
+        if username and d and not target_user:
+            user_id = user_ids.get(username)
+            if not user_id:
+                flash("❌ User not found.")
+                return render_template("send_message.html", step=1)
+
+            # get all users this person has sessions with (both directions)
+            partners = db.session.query(User.name).join(Session, Session.to_user_id == User.id) \
+                .filter(Session.from_user_id == user_id)
+            from_other_side = db.session.query(User.name).join(Session, Session.from_user_id == User.id) \
+                .filter(Session.to_user_id == user_id)
+            all_users = [row[0] for row in partners.union(from_other_side).all() if row[0] != username]
+
+            # show them list of possible users to message
+            return render_template("send_message.html", step=2, username=username, d=d, p=p, q=q, users=all_users)
+
+        # User picked who to message, but not the session label yet
+        elif username and d and target_user and not session_label:
+            ids = user_ids.get_many([username, target_user])
+            session_labels_raw = db.session.query(Session.label).filter(
+                Session.between(ids.get(username), ids.get(target_user))
+            ).distinct().all()
+            session_labels = [row[0] for row in session_labels_raw]
+
+            # show all labels (in case they have multiple sessions)
+            return render_template("send_message.html", step=2, username=username, d=d, p=p, q=q,
+                                   users=[], target_user=target_user, session_labels=session_labels)
+
+        # Step 2 done: user selected target + label → time to decrypt Caesar key
+        elif username and d and target_user and session_label and not plaintext:
+            keys = public_keys.get_many([username, target_user])
+            user = keys.get(username)
+            target = keys.get(target_user)
+            session = sessions.get(user and user.id, target and target.id, session_label)
+
+            if not session:
+                flash("❌ Session not found.")
+                return render_template("send_message.html", step=1)
+
+            try:
+                # decrypt Caesar key with RSA (or grab it from the cache)
+                caesar_key = decrypt_session_key(session, user, d)
+
+                # now we’re ready to write the message
+                return render_template("send_message.html", step=3, username=username, d=d, p=p, q=q,
+                                       target_user=target_user, session_label=session_label, caesar_key=caesar_key)
+            except Exception as e:
+                flash(f"❌ Failed to decrypt session key: {e}")
+                return render_template("send_message.html", step=1)
+
+        # Step 3: all set, user wrote message → encrypt and store it
+        elif username and target_user and session_label and plaintext and d:
+            ids = user_ids.get_many([username, target_user])
+            if len(ids) != 2:
+                flash("❌ User not found.")
+                return render_template("send_message.html", step=1)
+
+            msg = caesar_encrypt(plaintext, int(request.form.get("caesar_key")))
+            new_msg = Message(sender_id=ids[username], receiver_id=ids[target_user],
+                              encrypted_text=msg, session_label=session_label)
+            db.session.add(new_msg)
+            inbox.notify(db.session, [ids[target_user]])
+            db.session.commit()
+            flash("✅ Message sent!")
+            return redirect(url_for('.send_message'))
+
+        # fallback → something’s missing or not right
+        flash("⚠️ Please fill out required fields.")
+        return render_template("send_message.html", step=1)
+
+    # GET request → just load step 1
+    return render_template("send_message.html", step=1)
+
+
+
+
+@web.route("/read-messages", methods=["GET", "POST"])
+def read_messages():
+    if request.method == "POST":
+        username = request.form.get("username")
+        from_user = request.form.get("from_user")
+        session_label = request.form.get("session_label")
+        d = request.form.get("d")  # private RSA key
+
+        # Step 1 → Step 2: user entered their name
+        if username and not from_user:
+            user_id = user_ids.get(username)
+            if not user_id:
+                flash("❌ User not found.")
+                return render_template("read_messages.html", step=1)
+
+            # get all people who sent this user a message
+            senders_raw = db.session.query(User.name).join(Message, Message.sender_id == User.id) \
+                .filter(Message.receiver_id == user_id).distinct().all()
+            senders = [s[0] for s in senders_raw]
+
+            if not senders:
+                flash("📭 No messages found.")
+                return render_template("read_messages.html", step=1)
+
+            # show list of users who sent msgs
+            return render_template("read_messages.html", step=2, username=username, senders=senders)
+
+        # Step 2 → Step 3: user picked a sender, now show session labels
+        elif username and from_user and not session_label:
+            ids = user_ids.get_many([username, from_user])
+            labels_raw = db.session.query(Session.label).filter(
+                Session.between(ids.get(username), ids.get(from_user))
+            ).all()
+
+            labels = [row[0] for row in labels_raw]
+
+            if not labels:
+                flash("❌ No session found between you and this user.")
+                return render_template("read_messages.html", step=2, username=username, senders=[from_user])
+
+            # show session label options
+            return render_template("read_messages.html", step=3,
+                                   username=username, from_user=from_user,
+                                   session_labels=labels)
+
+        # Step 3 → Step 4: user picked label, now we decrypt messages
+        # (one page at a time, "after" is the cursor from the previous page;
+        # format=json gets the same page as JSON instead of HTML.
+        # stream=1 sends the whole history instead, rendered while it's fetched)
+        elif username and from_user and session_label and d:
+            want_json = request.values.get("format") in ("json", "ndjson")
+            keys = public_keys.get_many([username, from_user])
+            user = keys.get(username)
+            if not user:
+                if want_json:
+                    return jsonify({"error": "user not found"}), 404
+                flash("❌ User not found.")
+                return render_template("read_messages.html", step=1)
+            sender_id = keys[from_user].id if from_user in keys else None
+
+            # find the session based on label + who it’s with
+            session = sessions.get(user.id, sender_id, session_label)
+
+            if not session:
+                if want_json:
+                    return jsonify({"error": "session not found"}), 404
+                flash("❌ Session not found.")
+                return render_template("read_messages.html", step=3,
+                                       username=username, from_user=from_user, session_labels=[])
+
+            try:
+                after = int(request.values.get("after") or 0)
+                page_size = min(int(request.values.get("page_size") or MESSAGE_PAGE_SIZE), MAX_MESSAGE_PAGE_SIZE)
+
+                # decrypt the Caesar key for our side of the session (cached after the first time)
+                caesar_key = decrypt_session_key(session, user, d)
+
+                if request.values.get("stream"):
+                    history = iter_message_history(user.id, sender_id, session_label, caesar_key, after)
+                    if request.values.get("format") == "ndjson":
+                        # one JSON object per line, written out as rows come in
+                        lines = (json.dumps(msg) + "\n" for msg in history)
+                        return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+                    return stream_template("read_messages.html", step=4,
+                                           username=username,
+                                           from_user=from_user,
+                                           session_label=session_label,
+                                           messages_list=history)
+
+                # get the next page of messages from sender for this session
+                msgs, next_cursor = fetch_message_page(user.id, sender_id, session_label, after, max(page_size, 1))
+                messages_list = decrypt_rows(msgs, caesar_key)
+
+                if want_json:
+                    return jsonify({"messages": messages_list, "next_cursor": next_cursor})
+
+                # show the messages
+                return render_template("read_messages.html", step=4,
+                                       username=username,
+                                       from_user=from_user,
+                                       session_label=session_label,
+                                       d=d, p=request.form.get("p"), q=request.form.get("q"),
+                                       messages_list=messages_list,
+                                       next_cursor=next_cursor)
+
+            except Exception as e:
+                if want_json:
+                    return jsonify({"error": f"decryption error: {e}"}), 400
+                flash(f"❌ Decryption error: {e}")
+                return render_template("read_messages.html", step=3,
+                                       username=username, from_user=from_user, session_labels=[session_label])
+
+    # GET request or fallback → start at step 1
+    return render_template("read_messages.html", step=1)
+
+
+# forget every session key we cached for this user
+@web.route("/logout", methods=["POST"])
+def logout():
+    username = request.form.get("username")
+    user_id = user_ids.get(username) if username else None
+    if user_id:
+        session_keys.purge_user(user_id)
+    flash("👋 Logged out, cached session keys cleared.")
+    return redirect(url_for('.home'))
+
+
+# simple JSON metrics for monitoring
+@web.route("/metrics")
+def metrics():
+    return jsonify({
+        "key_pool": key_pool.stats(),
+        "keygen_workers": keygen_service.max_workers if keygen_service else 0,
+        "rsa_backend": RSA_BACKEND,
+        "cache": {
+            "user_ids": user_ids.stats(),
+            "public_keys": public_keys.stats(),
+            "sessions": sessions.stats(),
+            "session_keys": session_keys.stats(),
+        },
+        "inbox": inbox.stats(),
+        "db_pool": pool_monitor.stats(),
+    })